@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Optional
+import numpy as np
+from keyword_matcher import match_keywords
+
+# -------------------- Configuration --------------------
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") != "0"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # min cosine similarity for a hit
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+
+def is_emergency(text: str) -> bool:
+    """True when the text mentions an emergency keyword; questions like these are always answered fresh"""
+    return "emergency" in match_keywords(text)
+
+# -------------------- Semantic Answer Cache --------------------
+class SemanticAnswerCache:
+    """Formatted tool answers looked up by cosine similarity of the query embedding.
+
+    Entries sit in a fixed-size matrix of unit vectors, so a lookup is one matrix-vector
+    product over at most max_entries rows. Entries expire after ttl seconds; when the
+    matrix is full the least recently used entry is overwritten. Answers are scoped by
+    tool name so one tool never serves another tool's response.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.vectors = None  # (max_entries, dim) float32, allocated on the first put
+        self.answers = [None] * max_entries
+        self.scope_ids = {}  # scope name -> small int stored per slot
+        self.slot_scope = np.full(max_entries, -1)
+        self.expires = np.zeros(max_entries)  # 0 marks a free slot
+        self.last_used = np.zeros(max_entries)
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "writes": 0, "expired": 0, "evictions": 0}
+        self.mutex = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        stale = (self.expires > 0) & (self.expires <= now)
+        if stale.any():
+            for slot in np.flatnonzero(stale):
+                self.answers[slot] = None
+            self.expires[stale] = 0
+            self.stats["expired"] += int(stale.sum())
+
+    def get(self, scope: str, vector, text: str = "") -> Optional[str]:
+        """Cached answer for the closest earlier query above the threshold, else None"""
+        if is_emergency(text):
+            with self.mutex:
+                self.stats["bypassed"] += 1
+            return None
+        query = self._unit(vector)
+        with self.mutex:
+            now = time.monotonic()
+            self._expire(now)
+            if self.vectors is None or self.vectors.shape[1] != len(query):
+                self.stats["misses"] += 1
+                return None
+            similarity = self.vectors @ query
+            live = (self.slot_scope == self.scope_ids.get(scope, -2)) & (self.expires > 0)
+            similarity[~live] = -1.0
+            slot = int(np.argmax(similarity))
+            if similarity[slot] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.last_used[slot] = now
+            self.stats["hits"] += 1
+            return self.answers[slot]
+
+    def put(self, scope: str, vector, answer: str, text: str = "") -> bool:
+        """Store an answer; emergency questions are never cached"""
+        if is_emergency(text):
+            return False
+        query = self._unit(vector)
+        with self.mutex:
+            now = time.monotonic()
+            self._expire(now)
+            if self.vectors is None or self.vectors.shape[1] != len(query):
+                # First entry, or the embedding model changed: start over at the new dimension
+                self.vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+                self.expires[:] = 0
+                self.answers = [None] * self.max_entries
+            free = np.flatnonzero(self.expires == 0)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self.last_used))
+                self.stats["evictions"] += 1
+            self.vectors[slot] = query
+            self.answers[slot] = answer
+            self.slot_scope[slot] = self.scope_ids.setdefault(scope, len(self.scope_ids))
+            self.expires[slot] = now + self.ttl
+            self.last_used[slot] = now
+            self.stats["writes"] += 1
+            return True
+
+    def __len__(self):
+        return int(np.count_nonzero(self.expires))
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def report(self):
+        print(f"[INFO] Answer cache: {self.stats['hits']} hits, {self.stats['misses']} misses "
+              f"({self.hit_rate():.1%} hit rate), {self.stats['bypassed']} emergency bypasses, "
+              f"{self.stats['expired']} expired, {self.stats['evictions']} evicted, {len(self)} live")
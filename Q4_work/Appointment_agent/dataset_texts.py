@@ -0,0 +1,217 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+# Row -> text preparation shared by ingestion (embedding.py) and the local lexical index
+DATASETS_DIR = "datasets"
+CSV_CHUNK_ROWS = 1000  # rows read per pandas chunk; bounds memory per file
+
+def prepare_text_from_row(row, filename):
+    """Convert a DataFrame row to descriptive text"""
+    text_parts = []
+
+    # Add file context
+    text_parts.append(f"Source: {filename}")
+
+    # Add disease information if present
+    if 'Disease' in row:
+        text_parts.append(f"Disease: {row['Disease']}")
+
+    # Add specific information based on file type
+    if 'medications' in filename.lower():
+        if 'Medication' in row:
+            text_parts.append(f"Medications: {row['Medication']}")
+        elif 'Drug' in row:
+            text_parts.append(f"Drug: {row['Drug']}")
+
+    elif 'symptoms' in filename.lower():
+        symptoms = [row[col] for col in row.index if 'Symptom' in col and pd.notna(row[col]) and row[col].strip() != '']
+        if symptoms:
+            text_parts.append(f"Symptoms: {', '.join(symptoms)}")
+
+    elif 'diets' in filename.lower():
+        if 'Diet' in row:
+            text_parts.append(f"Diet Recommendation: {row['Diet']}")
+
+    elif 'precautions' in filename.lower():
+        precautions = [row[col] for col in row.index if 'Precaution' in col and pd.notna(row[col]) and row[col].strip() != '']
+        if precautions:
+            text_parts.append(f"Precautions: {', '.join(precautions)}")
+
+    elif 'doctors' in filename.lower():
+        # Handle doctors data
+        for col in row.index:
+            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
+                text_parts.append(f"{col}: {row[col]}")
+
+    elif 'workout' in filename.lower():
+        if 'Workout' in row:
+            text_parts.append(f"Workout: {row['Workout']}")
+        elif 'Exercise' in row:
+            text_parts.append(f"Exercise: {row['Exercise']}")
+
+    elif 'severity' in filename.lower():
+        for col in row.index:
+            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
+                text_parts.append(f"{col}: {row[col]}")
+
+    elif 'description' in filename.lower() or 'Training' in filename:
+        for col in row.index:
+            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
+                text_parts.append(f"{col}: {row[col]}")
+
+    return " | ".join(text_parts)
+
+def _column_pieces(series, prefix="", keep_missing=False):
+    """Render each distinct value of a column once and broadcast the strings back with NumPy.
+
+    Missing or blank cells become None unless keep_missing is set, in which case they
+    render as 'nan' exactly like the f-strings in prepare_text_from_row.
+    """
+    codes, uniques = pd.factorize(series)
+    rendered = []
+    for value in uniques:
+        text = str(value)
+        rendered.append(prefix + text if keep_missing or text.strip() != "" else None)
+    # factorize marks missing cells with code -1, which picks this last entry
+    rendered.append(prefix + "nan" if keep_missing else None)
+    return np.array(rendered, dtype=object)[codes]
+
+def _join_pieces(pieces, sep):
+    """Join aligned piece arrays row by row, skipping missing pieces"""
+    rows = np.column_stack(pieces).tolist()
+    return np.array([sep.join(filter(None, row)) or None for row in rows], dtype=object)
+
+def _labelled_columns(df):
+    """'column: value' pieces for every non-empty cell, as used for doctors/severity/description/training"""
+    return [_column_pieces(df[col], f"{col}: ") for col in df.columns if col not in ['Unnamed: 0']]
+
+def _joined_columns(df, marker, label):
+    """'Label: a, b, c' piece built from every non-empty column whose name contains marker"""
+    columns = [_column_pieces(df[col]) for col in df.columns if marker in col]
+    if not columns:
+        return None
+    joined = _join_pieces(columns, ", ")
+    return np.array([label + text if text else None for text in joined], dtype=object)
+
+def prepare_texts_from_frame(df, filename):
+    """Column-vectorized prepare_text_from_row: one text per DataFrame row"""
+    name = filename.lower()
+    pieces = [np.full(len(df), f"Source: {filename}", dtype=object)]
+
+    if 'Disease' in df.columns:
+        pieces.append(_column_pieces(df['Disease'], "Disease: ", keep_missing=True))
+
+    if 'medications' in name:
+        if 'Medication' in df.columns:
+            pieces.append(_column_pieces(df['Medication'], "Medications: ", keep_missing=True))
+        elif 'Drug' in df.columns:
+            pieces.append(_column_pieces(df['Drug'], "Drug: ", keep_missing=True))
+
+    elif 'symptoms' in name:
+        symptoms = _joined_columns(df, 'Symptom', "Symptoms: ")
+        if symptoms is not None:
+            pieces.append(symptoms)
+
+    elif 'diets' in name:
+        if 'Diet' in df.columns:
+            pieces.append(_column_pieces(df['Diet'], "Diet Recommendation: ", keep_missing=True))
+
+    elif 'precautions' in name:
+        precautions = _joined_columns(df, 'Precaution', "Precautions: ")
+        if precautions is not None:
+            pieces.append(precautions)
+
+    elif 'doctors' in name:
+        pieces.extend(_labelled_columns(df))
+
+    elif 'workout' in name:
+        if 'Workout' in df.columns:
+            pieces.append(_column_pieces(df['Workout'], "Workout: ", keep_missing=True))
+        elif 'Exercise' in df.columns:
+            pieces.append(_column_pieces(df['Exercise'], "Exercise: ", keep_missing=True))
+
+    elif 'severity' in name:
+        pieces.extend(_labelled_columns(df))
+
+    elif 'description' in name or 'Training' in filename:
+        pieces.extend(_labelled_columns(df))
+
+    return pd.Series(_join_pieces(pieces, " | "), index=df.index)
+
+def iter_csv_rows(chunk_rows=CSV_CHUNK_ROWS, failed_files=None):
+    """Stream (texts, metadata) per CSV chunk so only one chunk is held in memory.
+
+    Files that cannot be read are appended to failed_files when a list is given.
+    """
+    # Sorted so global row offsets (and the vector ids built from them) do not depend on listing order
+    dataset_files = sorted(glob.glob(os.path.join(DATASETS_DIR, "*.csv")))
+
+    print(f"Found {len(dataset_files)} CSV files to process...")
+
+    for file_path in dataset_files:
+        filename = os.path.basename(file_path)
+        print(f"Processing {filename}...")
+
+        try:
+            row_count = 0
+            for df in pd.read_csv(file_path, chunksize=chunk_rows):
+                # Remove unnamed columns
+                df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+
+                texts = prepare_texts_from_frame(df, filename).tolist()
+                if 'Disease' in df.columns:
+                    diseases = df['Disease'].astype(object).where(df['Disease'].notna(), None).tolist()
+                else:
+                    diseases = [None] * len(df)
+
+                metadata = []
+                for idx, text, disease in zip(df.index.tolist(), texts, diseases):
+                    meta = {
+                        "source_file": filename,
+                        "row_index": idx,
+                        "text": text,
+                        "filename": filename
+                    }
+                    # Add disease if available
+                    if disease is not None:
+                        meta["disease"] = disease
+                    metadata.append(meta)
+
+                row_count += len(df)
+                yield texts, metadata
+
+            print(f"[OK] Processed {row_count} rows from {filename}")
+
+        except Exception as e:
+            print(f"[ERROR] Error processing {filename}: {e}")
+            if failed_files is not None:
+                failed_files.append(filename)
+            continue
+
+def iter_csv_batches(batch_size=50, chunk_rows=CSV_CHUNK_ROWS, failed_files=None):
+    """Yield fixed-size (texts, metadata) batches streamed across all CSV files"""
+    batch_texts, batch_metadata = [], []
+
+    for texts, metadata in iter_csv_rows(chunk_rows, failed_files):
+        batch_texts.extend(texts)
+        batch_metadata.extend(metadata)
+
+        while len(batch_texts) >= batch_size:
+            yield batch_texts[:batch_size], batch_metadata[:batch_size]
+            batch_texts, batch_metadata = batch_texts[batch_size:], batch_metadata[batch_size:]
+
+    if batch_texts:
+        yield batch_texts, batch_metadata
+
+def process_csv_files():
+    """Process all CSV files in the datasets folder"""
+    all_texts = []
+    all_metadata = []
+
+    for texts, metadata in iter_csv_batches():
+        all_texts.extend(texts)
+        all_metadata.extend(metadata)
+
+    return all_texts, all_metadata
@@ -0,0 +1,141 @@
+import ast
+import functools
+import hashlib
+import os
+import pickle
+import time
+from typing import Dict, List
+import pandas as pd
+from dataset_texts import DATASETS_DIR
+from disease_lookup import detect_diseases, disease_variants, normalize_name
+from keyword_matcher import match_keywords
+from symptom_index import symptom_phrase
+
+# -------------------- Configuration --------------------
+CARDS_CACHE_DIR = "cache"
+DISEASE_CARDS_VERSION = 2  # bump when the card layout changes
+TRAINING_FILE = "Training.csv"  # symptoms: the disease's columns set in any case, most frequent first
+# card field -> (file, disease column, value columns)
+CARD_SOURCES = {
+    "description": ("description.csv", "Disease", ["Description"]),
+    "medications": ("medications.csv", "Disease", ["Medication"]),
+    "diet": ("diets.csv", "Disease", ["Diet"]),
+    "precautions": ("precautions_df.csv", "Disease", ["Precaution_1", "Precaution_2", "Precaution_3", "Precaution_4"]),
+    "workout": ("workout_df.csv", "disease", ["workout"]),
+}
+# keyword_matcher categories that ask for each list field ("what should I eat / take / avoid");
+# workout_df.csv rows are mostly eating advice, so diet questions get them too
+SECTION_CATEGORIES = {"symptoms": ["card_symptoms"], "medications": ["card_medications"], "diet": ["card_diet"],
+                      "precautions": ["card_precautions"], "workout": ["card_workout", "card_diet"]}
+SECTION_TITLES = {"symptoms": "🩺 Symptoms", "medications": "💊 Medications", "diet": "🥗 Diet",
+                  "precautions": "🛡️ Precautions", "workout": "🏃 Lifestyle Tips"}
+
+# -------------------- Build --------------------
+def _values(cell) -> List[str]:
+    """A cell holding a Python list literal ("['a', 'b']") or a plain string -> list of strings"""
+    if pd.isna(cell):
+        return []
+    text = str(cell).strip()
+    if text.startswith("["):
+        try:
+            return [str(item).strip() for item in ast.literal_eval(text) if str(item).strip()]
+        except (ValueError, SyntaxError):
+            pass
+    return [text] if text else []
+
+def build_disease_cards(datasets_dir=DATASETS_DIR) -> Dict[str, Dict]:
+    """Join the five per-disease files and the Training.csv symptoms into one card per canonical disease name"""
+    variants = disease_variants(datasets_dir)
+    canonical = {normalize_name(raw): disease for disease, raws in variants.items() for raw in raws}
+    cards = {disease: {"disease": disease, "description": "", **{field: [] for field in SECTION_TITLES}}
+             for disease in variants}
+    for field, (filename, disease_column, value_columns) in CARD_SOURCES.items():
+        frame = pd.read_csv(os.path.join(datasets_dir, filename))
+        for _, row in frame.iterrows():
+            disease = canonical.get(normalize_name(row[disease_column]))
+            if disease is None:
+                continue
+            values = [value for column in value_columns for value in _values(row[column])]
+            if field == "description":
+                cards[disease]["description"] = cards[disease]["description"] or " ".join(values)
+            else:
+                cards[disease][field].extend(value for value in values if value not in cards[disease][field])
+
+    training = pd.read_csv(os.path.join(datasets_dir, TRAINING_FILE))
+    training = training.loc[:, ~training.columns.str.startswith("Unnamed")]
+    frequency = training.drop(columns="prognosis").groupby(training["prognosis"].map(normalize_name)).mean()
+    for raw, row in frequency.iterrows():
+        disease = canonical.get(raw)
+        if disease is not None:
+            present = row[row > 0].sort_values(ascending=False, kind="stable")
+            cards[disease]["symptoms"] = list(dict.fromkeys(symptom_phrase(column) for column in present.index))
+    return cards
+
+def _sources_key(datasets_dir=DATASETS_DIR) -> str:
+    """Cache key that changes whenever one of the card source files changes"""
+    filenames = [filename for filename, _, _ in CARD_SOURCES.values()] + [TRAINING_FILE]
+    stats = [(filename, os.path.getsize(path), os.stat(path).st_mtime_ns)
+             for filename in filenames for path in [os.path.join(datasets_dir, filename)]]
+    return hashlib.md5(repr(stats).encode()).hexdigest()
+
+def load_disease_cards(datasets_dir=DATASETS_DIR, cache_dir=CARDS_CACHE_DIR) -> Dict[str, Dict]:
+    """Load the pickled cards for the current datasets, building and caching them when missing"""
+    cache_file = os.path.join(cache_dir, f"disease_cards_v{DISEASE_CARDS_VERSION}_{_sources_key(datasets_dir)}.pkl")
+    if os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+
+    started = time.perf_counter()
+    cards = build_disease_cards(datasets_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + ".tmp", "wb") as f:
+        pickle.dump(cards, f)
+    os.replace(cache_file + ".tmp", cache_file)
+    print(f"[OK] Built {len(cards)} disease cards in {time.perf_counter() - started:.2f}s")
+    return cards
+
+# -------------------- Lookup --------------------
+@functools.lru_cache(maxsize=1)
+def card_keys() -> Dict[str, str]:
+    """Every raw spelling ("Diabetes ", "Peptic ulcer diseae") -> canonical card key"""
+    variants = disease_variants()
+    keys = {normalize_name(raw): disease for disease, raws in variants.items() for raw in raws}
+    keys.update({normalize_name(disease): disease for disease in variants})
+    return keys
+
+def find_card(cards: Dict[str, Dict], name: str):
+    """Card for a disease name (dict lookup), or for the first disease a phrase mentions"""
+    disease = card_keys().get(normalize_name(name))
+    if disease is None:
+        mentioned = detect_diseases(name)
+        disease = mentioned[0] if mentioned else None
+    return cards.get(disease) if disease else None
+
+def cards_for_question(cards: Dict[str, Dict], question: str) -> List[Dict]:
+    """Cards of every known disease a question names, in order of mention"""
+    return [cards[disease] for disease in detect_diseases(question) if disease in cards]
+
+def requested_sections(question: str) -> List[str]:
+    """Card fields a question asks for. Every field for an overview ("what is diabetes", or just the
+    name); none when it asks something a card cannot answer ("is diabetes hereditary")."""
+    categories = match_keywords(question)
+    sections = [field for field, wanted in SECTION_CATEGORIES.items() if categories.intersection(wanted)]
+    if sections:
+        return sections
+    if "card_overview" in categories or normalize_name(question.strip(" ?.!")) in card_keys():
+        return list(SECTION_TITLES)
+    return []
+
+def card_answers(cards: List[Dict], sections: List[str]) -> bool:
+    """True when the cards hold something for at least one requested section"""
+    return any(card[field] for card in cards for field in sections)
+
+def format_disease_card(card: Dict, sections: List[str] = None) -> str:
+    """Markdown card: description plus the requested list fields"""
+    text = f"📇 **Disease Card: {card['disease']}**\n\n"
+    if card["description"]:
+        text += f"{card['description']}\n\n"
+    for field in sections or list(SECTION_TITLES):
+        if card[field]:
+            text += f"**{SECTION_TITLES[field]}:**\n" + "".join(f"• {value}\n" for value in card[field]) + "\n"
+    return text
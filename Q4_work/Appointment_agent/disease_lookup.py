@@ -0,0 +1,100 @@
+import difflib
+import functools
+import os
+import re
+from typing import Dict, List
+import pandas as pd
+from dataset_texts import DATASETS_DIR
+
+# -------------------- Disease Names --------------------
+# The 41 canonical names come from description.csv; other files spell some of them differently
+# ("Diabetes ", "Peptic ulcer diseae", doubled spaces), so each canonical name keeps every raw
+# spelling seen in the metadata "disease" field and filters match all of them.
+CANONICAL_SOURCE = "description.csv"
+DISEASE_COLUMNS = ("Disease", "disease")
+CASE_SENSITIVE_NAMES = {"AIDS"}  # lowercase "aids" is an ordinary word
+
+def normalize_name(name) -> str:
+    return " ".join(str(name).lower().split())
+
+def _read_disease_column(path):
+    header = pd.read_csv(path, nrows=0).columns
+    column = next((col for col in DISEASE_COLUMNS if col in header), None)
+    return pd.read_csv(path, usecols=[column])[column].dropna().astype(str).unique().tolist() if column else []
+
+def build_disease_variants(datasets_dir=DATASETS_DIR) -> Dict[str, List[str]]:
+    """canonical name -> raw spellings stored in metadata across all datasets"""
+    canonical = {normalize_name(name): name.strip() for name in _read_disease_column(os.path.join(datasets_dir, CANONICAL_SOURCE))}
+    variants = {name: {raw} for name, raw in canonical.items()}
+    for filename in sorted(os.listdir(datasets_dir)):
+        if not filename.endswith(".csv"):
+            continue
+        for raw in _read_disease_column(os.path.join(datasets_dir, filename)):
+            key = normalize_name(raw)
+            if key not in canonical:
+                close = difflib.get_close_matches(key, list(canonical), n=1, cutoff=0.9)
+                if not close:
+                    continue
+                key = close[0]
+            variants[key].add(raw)
+    return {canonical[key]: sorted(raws) for key, raws in variants.items()}
+
+def _aliases(name: str) -> List[str]:
+    """Phrases that name a disease in a question: the full name plus each side of a parenthesis"""
+    aliases = {normalize_name(name)}
+    if "(" in name:
+        inside = re.findall(r"\(([^)]*)\)", name)
+        outside = re.sub(r"\([^)]*\)", " ", name)
+        aliases.update(normalize_name(part) for part in inside + [outside] if part.strip())
+    return [alias for alias in aliases if len(alias) > 2]
+
+def build_disease_pattern(variants: Dict[str, List[str]]):
+    """One alternation over all aliases, longest first; CASE_SENSITIVE_NAMES only match as written"""
+    alias_to_disease, phrases, acronyms = {}, [], []
+    for disease in variants:
+        if disease in CASE_SENSITIVE_NAMES:
+            acronyms.append(disease)
+            alias_to_disease[disease] = disease
+            continue
+        for alias in _aliases(disease):
+            alias_to_disease.setdefault(alias, disease)
+            phrases.append(alias)
+    phrases.sort(key=len, reverse=True)
+    pieces = [r"(?i:" + r"\s+".join(map(re.escape, phrase.split())) + r")" for phrase in phrases]
+    pieces += [re.escape(acronym) for acronym in acronyms]
+    pattern = re.compile(r"(?<![A-Za-z0-9])(?:" + "|".join(pieces) + r")(?![A-Za-z0-9])")
+    return pattern, alias_to_disease
+
+@functools.lru_cache(maxsize=4)
+def load_disease_lookup(datasets_dir=DATASETS_DIR):
+    """(variants, pattern, alias -> disease), built on first use; empty when the datasets cannot be read"""
+    try:
+        variants = build_disease_variants(datasets_dir)
+    except Exception as e:
+        print(f"[WARNING] Disease names unavailable, questions will not be matched to diseases: {e}")
+        return {}, None, {}
+    pattern, alias_to_disease = build_disease_pattern(variants)
+    return variants, pattern, alias_to_disease
+
+def disease_variants(datasets_dir=DATASETS_DIR) -> Dict[str, List[str]]:
+    """canonical name -> raw spellings, loaded once"""
+    return load_disease_lookup(datasets_dir)[0]
+
+# -------------------- Query Helpers --------------------
+def detect_diseases(query: str) -> List[str]:
+    """Canonical disease names mentioned in a question, in order of appearance"""
+    _, pattern, alias_to_disease = load_disease_lookup(DATASETS_DIR)
+    if pattern is None:
+        return []
+    found = []
+    for hit in pattern.finditer(query):
+        text = hit.group(0)
+        disease = alias_to_disease.get(text) or alias_to_disease.get(normalize_name(text))
+        if disease and disease not in found:
+            found.append(disease)
+    return found
+
+def disease_filter(diseases: List[str]) -> Dict:
+    """Metadata filter limiting a vector query to the rows of the given diseases"""
+    variants = disease_variants()
+    return {"disease": {"$in": [raw for disease in diseases for raw in variants.get(disease, [disease])]}}
@@ -1,11 +1,25 @@
-import pandas as pd
 from agents import OpenAIChatCompletionsModel, AsyncOpenAI
 from pinecone import Pinecone, ServerlessSpec
 import os
+import argparse
+import asyncio
+import bisect
+import collections
 import glob
+import hashlib
+import itertools
 from dotenv import load_dotenv
 import json
+import random
+import re
+import time
+from datetime import datetime
 import openai
+from dataset_texts import DATASETS_DIR, iter_csv_batches
+from embedding_cache import get_embedding_cache
+from namespaces import ALL_NAMESPACES, SOURCE_NAMESPACES, namespace_for
+from projection import embedding_space, index_dimension, project, project_one
+from vector_store import VECTOR_STORE_BACKEND, VECTOR_STORE_BACKENDS, LOCAL_STORE_DIR, LocalVectorStore, PineconeVectorStore, query_namespaces
 
 load_dotenv()
 
@@ -19,111 +33,28 @@ model = OpenAIChatCompletionsModel(model="gemini-2.5-flash", openai_client=exter
 # Pinecone API key
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 
-def prepare_text_from_row(row, filename):
-    """Convert a DataFrame row to descriptive text"""
-    text_parts = []
-
-    # Add file context
-    text_parts.append(f"Source: {filename}")
-
-    # Add disease information if present
-    if 'Disease' in row:
-        text_parts.append(f"Disease: {row['Disease']}")
-
-    # Add specific information based on file type
-    if 'medications' in filename.lower():
-        if 'Medication' in row:
-            text_parts.append(f"Medications: {row['Medication']}")
-        elif 'Drug' in row:
-            text_parts.append(f"Drug: {row['Drug']}")
-
-    elif 'symptoms' in filename.lower():
-        symptoms = [row[col] for col in row.index if 'Symptom' in col and pd.notna(row[col]) and row[col].strip() != '']
-        if symptoms:
-            text_parts.append(f"Symptoms: {', '.join(symptoms)}")
-
-    elif 'diets' in filename.lower():
-        if 'Diet' in row:
-            text_parts.append(f"Diet Recommendation: {row['Diet']}")
-
-    elif 'precautions' in filename.lower():
-        precautions = [row[col] for col in row.index if 'Precaution' in col and pd.notna(row[col]) and row[col].strip() != '']
-        if precautions:
-            text_parts.append(f"Precautions: {', '.join(precautions)}")
-
-    elif 'doctors' in filename.lower():
-        # Handle doctors data
-        for col in row.index:
-            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
-                text_parts.append(f"{col}: {row[col]}")
-
-    elif 'workout' in filename.lower():
-        if 'Workout' in row:
-            text_parts.append(f"Workout: {row['Workout']}")
-        elif 'Exercise' in row:
-            text_parts.append(f"Exercise: {row['Exercise']}")
-
-    elif 'severity' in filename.lower():
-        for col in row.index:
-            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
-                text_parts.append(f"{col}: {row[col]}")
-
-    elif 'description' in filename.lower() or 'Training' in filename:
-        for col in row.index:
-            if pd.notna(row[col]) and str(row[col]).strip() != '' and col not in ['Unnamed: 0']:
-                text_parts.append(f"{col}: {row[col]}")
-
-    return " | ".join(text_parts)
-
-def process_csv_files():
-    """Process all CSV files in the datasets folder"""
-    dataset_files = glob.glob("datasets/*.csv")
-    all_texts = []
-    all_metadata = []
-
-    print(f"Found {len(dataset_files)} CSV files to process...")
-
-    for file_path in dataset_files:
-        filename = os.path.basename(file_path)
-        print(f"Processing {filename}...")
-
-        try:
-            df = pd.read_csv(file_path)
-
-            # Remove unnamed columns
-            df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-
-            for idx, row in df.iterrows():
-                text = prepare_text_from_row(row, filename)
-                if text and len(text.strip()) > 0:
-                    metadata = {
-                        "source_file": filename,
-                        "row_index": idx,
-                        "text": text,
-                        "filename": filename
-                    }
-
-                    # Add disease if available
-                    if 'Disease' in row and pd.notna(row['Disease']):
-                        metadata["disease"] = row['Disease']
-
-                    all_texts.append(text)
-                    all_metadata.append(metadata)
-
-            print(f"[OK] Processed {len(df)} rows from {filename}")
-
-        except Exception as e:
-            print(f"[ERROR] Error processing {filename}: {e}")
-            continue
-
-    return all_texts, all_metadata
+EMBEDDING_MODEL = "text-embedding-004"
+MANIFEST_PATH = os.path.join("cache", "embedding_manifest.json")
+DELETE_BATCH_SIZE = 1000  # Pinecone accepts at most 1000 ids per delete
+DEDUP_MODES = ("fanout", "collapse")
+DEDUP_MODE = os.getenv("EMBED_DEDUP_MODE", "fanout")
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # embedding requests in flight
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "2"))  # Pinecone upserts in flight
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # units buffered between stages
+JOURNAL_PATH = os.path.join("cache", "embedding_journal.jsonl")
+RETRY_ATTEMPTS = int(os.getenv("EMBED_RETRY_ATTEMPTS", "4"))  # tries per embed/upsert request
+RETRY_BASE_DELAY = float(os.getenv("EMBED_RETRY_BASE_DELAY", "1.0"))  # seconds, doubled per retry
+EMBED_TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "8192"))  # estimated tokens per embedding request
+EMBED_MIN_TOKEN_BUDGET = 256  # the budget never shrinks below this
+EMBED_MAX_BATCH_ITEMS = int(os.getenv("EMBED_MAX_BATCH_ITEMS", "100"))  # provider cap on inputs per request
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
 
 def create_pinecone_index(index_name):
     """Create Pinecone index if it doesn't exist"""
     if index_name not in [index.name for index in pc.list_indexes()]:
         pc.create_index(
             name=index_name,
-            dimension=768,  # text-embedding-004 ka dimension
+            dimension=index_dimension(768),  # text-embedding-004 ka dimension (shared space when projecting)
             metric="cosine",
             spec=ServerlessSpec(cloud="aws", region="us-east-1")
         )
@@ -133,66 +64,759 @@ def create_pinecone_index(index_name):
 
     return pc.Index(index_name)
 
-def batch_upload_embeddings(texts, metadata, index_name, batch_size=50):
-    """Upload embeddings in batches to avoid rate limits"""
-    index = create_pinecone_index(index_name)
-    total_texts = len(texts)
-
-    for i in range(0, total_texts, batch_size):
-        batch_texts = texts[i:i+batch_size]
-        batch_metadata = metadata[i:i+batch_size]
-
-        # Create embeddings for batch
+def open_vector_index(index_name, backend=VECTOR_STORE_BACKEND):
+    """Vector store to sync into: the Pinecone index (created if missing) or the local store"""
+    if backend == "local":
+        return LocalVectorStore()
+    return PineconeVectorStore(index=create_pinecone_index(index_name))
+
+def sync_state_paths(backend=VECTOR_STORE_BACKEND):
+    """Manifest and journal paths; each backend tracks its own sync state"""
+    if backend == "local":
+        return os.path.join(LOCAL_STORE_DIR, "embedding_manifest.json"), os.path.join(LOCAL_STORE_DIR, "embedding_journal.jsonl")
+    return MANIFEST_PATH, JOURNAL_PATH
+
+# -------------------- Incremental Sync Manifest --------------------
+def text_hash(text):
+    """Stable content hash of a row's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def vector_id_for(meta, n):
+    """Deterministic vector id: <source_file>_<global row position>"""
+    return f"{meta['source_file'].replace('.csv', '')}_{n}"
+
+def load_manifest(path=MANIFEST_PATH):
+    """Load the {row_id: {hash, model, source_file, vector_id}} record of what is already in the index"""
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[WARNING] Could not read manifest {path}, doing a full sync: {e}")
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the manifest atomically so an interrupted run never leaves it half written"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def _is_current(entry, digest, holder_id):
+    """True when the manifest says holder_id already stores this text's embedding in its family's namespace"""
+    return (
+        entry is not None
+        and entry["hash"] == digest
+        and entry["model"] == embedding_space(EMBEDDING_MODEL)
+        and entry.get("vector_id", holder_id) == holder_id
+        and entry.get("namespace", "") == namespace_for(entry["source_file"])
+    )
+
+def _manifest_entry(digest, source_file, holder_id):
+    """Manifest record for a row whose embedding is stored under holder_id"""
+    return {"hash": digest, "model": embedding_space(EMBEDDING_MODEL), "source_file": source_file, "vector_id": holder_id,
+            "namespace": namespace_for(source_file)}
+
+# -------------------- Checkpoint Journal --------------------
+def dataset_fingerprint(batch_size=50, dedup_mode=DEDUP_MODE):
+    """Identify the inputs that decide row ranges, so a journal is only resumed against the same data"""
+    files = []
+    for file_path in sorted(glob.glob(os.path.join(DATASETS_DIR, "*.csv"))):
+        stat = os.stat(file_path)
+        files.append([os.path.basename(file_path), stat.st_size, stat.st_mtime_ns])
+    return {"files": files, "model": embedding_space(EMBEDDING_MODEL), "dedup_mode": dedup_mode, "batch_size": batch_size,
+            "namespaces": SOURCE_NAMESPACES}
+
+class IngestJournal:
+    """Append-only on-disk record of which row ranges reached Pinecone.
+
+    Each line is JSON: a "run" header carrying the dataset fingerprint, then one
+    "committed" or "failed" line per planner batch range [start, end). Lines are flushed
+    and fsynced as they are written, so a killed run loses at most the ranges in flight.
+    """
+
+    def __init__(self, path, fingerprint, resume=False):
+        self.path = path
+        self.committed = set()
+        self.failed = {}
+
+        if resume:
+            self._load(fingerprint)
+        # Ranges committed before this run, for bisect lookups while planning
+        self._resumed_ends = dict(sorted(self.committed))
+        self._resumed_starts = list(self._resumed_ends)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._write({"event": "run", "started": datetime.now().isoformat(), "resume": resume, "fingerprint": fingerprint})
+
+    def _load(self, fingerprint):
+        """Replay earlier runs' lines; a header for different data discards what came before"""
+        if not os.path.exists(self.path):
+            print(f"[WARNING] No journal at {self.path}, nothing to resume; syncing everything")
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line of a killed run
+
+                if record["event"] == "run":
+                    if record["fingerprint"] != fingerprint:
+                        self.committed, self.failed = set(), {}
+                elif record["event"] == "committed":
+                    self.committed.add((record["start"], record["end"]))
+                    self.failed.pop((record["start"], record["end"]), None)
+                elif record["event"] == "failed":
+                    self.failed[(record["start"], record["end"])] = record.get("error", "")
+
+        if self.committed or self.failed:
+            print(f"[INFO] Resuming: {len(self.committed)} ranges already committed, {len(self.failed)} failed ranges to retry")
+        else:
+            print(f"[WARNING] Journal {self.path} does not match the current datasets; syncing everything")
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def is_committed(self, position):
+        """True when the row at this global position was committed by an earlier run"""
+        k = bisect.bisect_right(self._resumed_starts, position) - 1
+        return k >= 0 and position < self._resumed_ends[self._resumed_starts[k]]
+
+    def record(self, start, end, error=None):
+        """Journal a settled range"""
+        if error is None:
+            self.failed.pop((start, end), None)
+            if (start, end) not in self.committed:
+                self.committed.add((start, end))
+                self._write({"event": "committed", "start": start, "end": end})
+        else:
+            self.failed[(start, end)] = error
+            self._write({"event": "failed", "start": start, "end": end, "error": error})
+
+    def close(self):
+        self.file.close()
+
+    def report(self):
+        """Print the ranges that are still failed at exit"""
+        if not self.failed:
+            print("[OK] All row ranges committed")
+            return
+
+        print(f"[ERROR] {len(self.failed)} row ranges still failed; rerun with --resume to retry only these:")
+        for (start, end), error in sorted(self.failed.items()):
+            print(f"   rows {start}-{end - 1}: {error}")
+
+# -------------------- De-duplicating Sync --------------------
+class EmbeddingSync:
+    """Incremental sync of dataset rows into Pinecone that embeds each unique text once.
+
+    Every text starts with "Source: <file>", so duplicates only occur within one file and
+    a file's dedup state is dropped once the stream has moved past it and all of its
+    units have finished.
+
+    dedup_mode "fanout" writes one vector per row id, reusing a single embedding for every
+    row sharing a text. "collapse" writes one vector per unique text under the first row's
+    id, with the ids of all rows sharing it in metadata["source_rows"].
+    """
+
+    def __init__(self, index, manifest, failed_files=(), dedup_mode=DEDUP_MODE, batch_size=50, journal=None, batcher=None,
+                 cache=None):
+        if dedup_mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode {dedup_mode!r}, expected one of {DEDUP_MODES}")
+
+        self.index = index
+        self.manifest = manifest
+        self.failed_files = failed_files
+        self.dedup_mode = dedup_mode
+        self.batch_size = batch_size
+        self.seen_ids = set()
+        self.orphan_ids = []  # (vector_id, namespace) pairs no row is served from any more
+        self.stats = {"skipped": 0, "embedded": 0, "deleted": 0, "failed": 0, "embedding_inputs": 0, "cache_hits": 0}
+        self.file_stats = {}
+        self.current_file = None
+        self.file_groups = {}
+        # source_file -> {digest: Future of the embedding}; shared by concurrent units
+        self.file_vectors = {}
+        self.open_units = {}
+        # planner batch start -> range bookkeeping until it is journaled
+        self.journal = journal
+        self.ranges = {}
+        self.batcher = batcher or AdaptiveTokenBatcher()
+        self.cache = cache or get_embedding_cache()
+
+    def plan(self, start, rows):
+        """Turn one batch of (vector_id, text, meta) rows, starting at global position start,
+        into upload units of embedding jobs.
+
+        A job is {"text", "digest", "targets": [(vector_id, meta), ...], "ranges": {start, ...}}.
+        Rows an earlier run already committed (per the journal) are recorded as current
+        without being embedded again.
+        """
+        units = []
+        jobs = {}
+        self.ranges[start] = {"end": start + len(rows), "pending": 0, "error": None, "sealed": False, "last_file": None}
+
+        for position, (vector_id, text, meta) in enumerate(rows, start):
+            if meta["source_file"] != self.current_file:
+                # Units never span files, so a unit's dedup state is always its own file's
+                if jobs:
+                    units.append(list(jobs.values()))
+                    jobs = {}
+                units.extend(self._finish_file())
+                self.current_file = meta["source_file"]
+
+            digest = text_hash(text)
+            self.seen_ids.add(vector_id)
+            self.ranges[start]["last_file"] = self.current_file
+            file_stats = self.file_stats.setdefault(self.current_file, {"rows": 0, "unique": set()})
+            file_stats["rows"] += 1
+            file_stats["unique"].add(digest)
+            resumed = self.journal is not None and self.journal.is_committed(position)
+
+            if self.dedup_mode == "collapse":
+                group = self.file_groups.setdefault(digest, {"text": text, "digest": digest, "targets": [], "ranges": set(), "resumed": set()})
+                group["targets"].append((vector_id, meta))
+                group["ranges"].add(start)
+                if resumed:
+                    group["resumed"].add(vector_id)
+            elif resumed:
+                self.manifest[vector_id] = _manifest_entry(digest, meta["source_file"], vector_id)
+                self.stats["skipped"] += 1
+            elif _is_current(self.manifest.get(vector_id), digest, vector_id):
+                self.stats["skipped"] += 1
+            else:
+                job = jobs.setdefault(digest, {"text": text, "digest": digest, "targets": [], "ranges": {start}})
+                job["targets"].append((vector_id, meta))
+
+        if jobs:
+            units.append(list(jobs.values()))
+        return units
+
+    def finish(self):
+        """Upload units still buffered for the last file"""
+        return self._finish_file()
+
+    def _finish_file(self):
+        """Close the current file; in collapse mode emit its changed groups"""
+        units = []
+
+        if self.dedup_mode == "collapse":
+            changed = []
+            for group in self.file_groups.values():
+                holder_id = group["targets"][0][0]
+                holder_entry = self.manifest.get(holder_id)
+                if len(group["resumed"]) == len(group["targets"]):
+                    # Every row was committed by an earlier run; only the manifest needs catching up
+                    self._record_rows(group, holder_id)
+                    self.stats["skipped"] += len(group["targets"])
+                    continue
+
+                current = (
+                    holder_entry is not None
+                    and holder_entry.get("rows") == len(group["targets"])
+                    and all(_is_current(self.manifest.get(vector_id), group["digest"], holder_id)
+                            for vector_id, _ in group["targets"])
+                )
+                if current:
+                    self.stats["skipped"] += len(group["targets"])
+                else:
+                    changed.append(group)
+            units = [changed[k:k + self.batch_size] for k in range(0, len(changed), self.batch_size)]
+
+        self.file_groups = {}
+        return units
+
+    def embed(self, texts):
+        """Embed a list of texts in one request (blocking; the batcher runs it in a worker thread)"""
+        response = external_client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+        return [item.embedding for item in response.data]
+
+    def open_unit(self, unit):
+        """Mark a unit as in flight so its file's embeddings and row ranges stay open"""
+        source_file = _unit_source(unit)
+        self.open_units[source_file] = self.open_units.get(source_file, 0) + 1
+        for start in _unit_ranges(unit):
+            self.ranges[start]["pending"] += 1
+
+    def close_unit(self, unit, error=None):
+        """Mark a unit as finished, settle its row ranges and drop dedup state no later unit can reuse"""
+        source_file = _unit_source(unit)
+        self.open_units[source_file] -= 1
+        for filename in list(self.file_vectors):
+            if filename != self.current_file and not self.open_units.get(filename):
+                del self.file_vectors[filename]
+
+        for start in _unit_ranges(unit):
+            rng = self.ranges[start]
+            rng["pending"] -= 1
+            if error is not None and rng["error"] is None:
+                rng["error"] = error
+            self._settle(start)
+
+    def seal_ranges(self, final=False):
+        """Mark ranges whose every row has been handed to a unit; call after opening the plan's units.
+
+        In collapse mode a range's rows are only planned once its last file is finished.
+        """
+        for start, rng in list(self.ranges.items()):
+            if rng["sealed"]:
+                continue
+            if final or self.dedup_mode == "fanout" or rng["last_file"] != self.current_file:
+                rng["sealed"] = True
+                self._settle(start)
+
+    def _settle(self, start):
+        """Journal a sealed range once none of its units are in flight"""
+        rng = self.ranges[start]
+        if rng["sealed"] and rng["pending"] == 0:
+            if self.journal is not None:
+                self.journal.record(start, rng["end"], rng["error"])
+            del self.ranges[start]
+
+    async def resolve_embeddings(self, unit, stage=None):
+        """Embed the texts no other unit has claimed yet, then await the rest.
+
+        Each unique text is embedded exactly once even when units sharing it run
+        concurrently: the first unit to see a digest owns the request and later units
+        wait on its future. Successful requests are added to the stage counters when given.
+        Returns (values_by_digest, number of texts this unit embedded).
+        """
+        memo = self.file_vectors.setdefault(_unit_source(unit), {})
+        loop = asyncio.get_running_loop()
+
+        owned = []
+        for job in unit:
+            if job["digest"] not in memo:
+                memo[job["digest"]] = loop.create_future()
+                owned.append(job)
+
+        if owned:
+            started = time.perf_counter()
+            try:
+                values = await self.embed_cached([job["text"] for job in owned])
+            except Exception:
+                # Release the claim so a later unit can retry; waiters see None and fail too
+                for job in owned:
+                    memo.pop(job["digest"]).set_result(None)
+                raise
+
+            if stage is not None:
+                _record_stage(stage, len(owned), started)
+            for job, job_values in zip(owned, values):
+                memo[job["digest"]].set_result(job_values)
+
+        values_by_digest = {}
+        for job in unit:
+            job_values = await memo[job["digest"]] if job["digest"] in memo else None
+            if job_values is None:
+                raise RuntimeError("shared embedding request for a duplicate text failed")
+            values_by_digest[job["digest"]] = job_values
+        return values_by_digest, len(owned)
+
+    async def embed_cached(self, texts):
+        """Embed texts, serving any the local embedding cache already holds"""
+        values = self.cache.get_many(EMBEDDING_MODEL, texts)
+        missing = [i for i, vector in enumerate(values) if vector is None]
+        for i, vector in enumerate(values):
+            if vector is not None:
+                values[i] = vector.tolist()
+        self.stats["cache_hits"] += len(texts) - len(missing)
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = await self.batcher.embed(self.embed, missing_texts)
+            self.stats["embedding_inputs"] += len(missing)
+            await asyncio.to_thread(self.cache.put_many, EMBEDDING_MODEL, missing_texts, fresh)
+            for i, vector in zip(missing, fresh):
+                values[i] = vector
+        return values
+
+    def build_vectors(self, unit, values_by_digest):
+        """Pinecone vectors for a unit once every job's embedding is known"""
+        # The cache keeps raw model vectors; the index stores them in the shared space when projecting
+        projected = dict(zip(values_by_digest, project(EMBEDDING_MODEL, list(values_by_digest.values()))))
+        vectors = []
+        for job in unit:
+            values = projected[job["digest"]]
+            if self.dedup_mode == "collapse":
+                holder_id, meta = job["targets"][0]
+                meta = dict(meta, source_rows=[vector_id for vector_id, _ in job["targets"]])
+                vectors.append({"id": holder_id, "values": values, "metadata": meta})
+            else:
+                for vector_id, meta in job["targets"]:
+                    vectors.append({"id": vector_id, "values": values, "metadata": meta})
+        return vectors
+
+    def commit(self, unit):
+        """Record a successfully upserted unit in the manifest"""
+        for job in unit:
+            holder_id = job["targets"][0][0] if self.dedup_mode == "collapse" else None
+            self._record_rows(job, holder_id)
+            self.stats["embedded"] += len(job["targets"])
+
+    def _record_rows(self, job, holder_id=None):
+        """Write manifest entries for a job's rows; holder_id is set for collapsed groups"""
+        for vector_id, meta in job["targets"]:
+            previous = self.manifest.get(vector_id)
+            if holder_id and vector_id != holder_id and previous and previous.get("vector_id", vector_id) == vector_id:
+                # This row used to hold its own vector; it is now served by the group holder
+                self.orphan_ids.append((vector_id, previous.get("namespace", "")))
+            elif previous and previous.get("namespace", "") != namespace_for(meta["source_file"]):
+                # Written before namespaces (or under another family); the old copy must go
+                self.orphan_ids.append((previous.get("vector_id", vector_id), previous.get("namespace", "")))
+
+            self.manifest[vector_id] = _manifest_entry(job["digest"], meta["source_file"], holder_id or vector_id)
+        if holder_id:
+            self.manifest[holder_id]["rows"] = len(job["targets"])
+
+    def fail(self, unit):
+        """Count the rows of a unit that could not be embedded or upserted"""
+        self.stats["failed"] += sum(len(job["targets"]) for job in unit)
+
+    def prune(self):
+        """Delete vectors whose rows disappeared, or that a collapsed group or namespace move replaced"""
+        stale_ids = {}
+        for vector_id, entry in self.manifest.items():
+            if vector_id not in self.seen_ids and entry.get("source_file") not in self.failed_files:
+                stale_ids.setdefault(entry.get("namespace", ""), []).append(vector_id)
+
+        for namespace, ids in stale_ids.items():
+            for k in range(0, len(ids), DELETE_BATCH_SIZE):
+                chunk = ids[k:k + DELETE_BATCH_SIZE]
+                try:
+                    self.index.delete(ids=chunk, namespace=namespace)
+                    for vector_id in chunk:
+                        del self.manifest[vector_id]
+                    self.stats["deleted"] += len(chunk)
+                except Exception as e:
+                    print(f"[ERROR] Error deleting {len(chunk)} stale vectors: {e}")
+
+        orphans = {}
+        for vector_id, namespace in self.orphan_ids:
+            orphans.setdefault(namespace, []).append(vector_id)
+        for namespace, ids in orphans.items():
+            for k in range(0, len(ids), DELETE_BATCH_SIZE):
+                chunk = ids[k:k + DELETE_BATCH_SIZE]
+                try:
+                    self.index.delete(ids=chunk, namespace=namespace)
+                except Exception as e:
+                    print(f"[ERROR] Error deleting {len(chunk)} replaced vectors: {e}")
+        self.orphan_ids = []
+
+    def report(self):
+        """Print the sync summary and the per-file dedup compression ratio"""
+        for filename, file_stats in self.file_stats.items():
+            unique = len(file_stats["unique"])
+            ratio = file_stats["rows"] / unique if unique else 1.0
+            print(f"[INFO] Dedup {filename}: {file_stats['rows']} rows -> {unique} unique texts ({ratio:.1f}x)")
+
+        print(f"[INFO] Sync summary: {self.stats['skipped']} skipped, {self.stats['embedded']} embedded "
+              f"({self.stats['embedding_inputs']} embedding inputs, {self.stats['cache_hits']} cache hits), "
+              f"{self.stats['deleted']} deleted, "
+              f"{self.stats['failed']} failed")
+
+def _unit_source(unit):
+    """Source file of an upload unit; units never span files"""
+    return unit[0]["targets"][0][1]["source_file"]
+
+def _unit_ranges(unit):
+    """Planner batch starts whose rows this unit carries"""
+    return set().union(*(job["ranges"] for job in unit))
+
+def iter_rows_with_ids(batches):
+    """Attach the deterministic vector id to every streamed row; yields (start, rows)"""
+    offset = 0
+    for batch_texts, batch_metadata in batches:
+        yield offset, [(vector_id_for(meta, offset + j), text, meta) for j, (text, meta) in enumerate(zip(batch_texts, batch_metadata))]
+        offset += len(batch_texts)
+
+async def with_retries(func, *args, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, give_up=None, **kwargs):
+    """Run a blocking call in a worker thread, retrying with exponential backoff and jitter.
+
+    Errors for which give_up(error) is true are raised straight away for the caller to handle.
+    """
+    for attempt in range(attempts):
         try:
-            response = external_client.embeddings.create(
-                model="text-embedding-004",
-                input=batch_texts
-            )
-
-            vectors = []
-            for j, (text, meta, embedding) in enumerate(zip(batch_texts, batch_metadata, response.data)):
-                vector_id = f"{meta['source_file'].replace('.csv', '')}_{i + j}"
-                vectors.append({
-                    "id": vector_id,
-                    "values": embedding.embedding,
-                    "metadata": meta
-                })
-
-            # Upsert to Pinecone
-            index.upsert(vectors=vectors)
-            print(f"[OK] Uploaded batch {i//batch_size + 1}/{(total_texts-1)//batch_size + 1} ({len(vectors)} embeddings)")
-
+            return await asyncio.to_thread(func, *args, **kwargs)
         except Exception as e:
-            print(f"[ERROR] Error in batch {i//batch_size + 1}: {e}")
+            if attempt == attempts - 1 or (give_up is not None and give_up(e)):
+                raise
+            delay = base_delay * 2 ** attempt * (0.5 + random.random())
+            print(f"[WARNING] {e}; retrying in {delay:.1f}s ({attempt + 1}/{attempts - 1})")
+            await asyncio.sleep(delay)
+
+# -------------------- Token-aware Batching --------------------
+def estimate_tokens(text):
+    """Cheap local token estimate: one per word, digit or symbol, plus one per 6 letters of long words.
+
+    It slightly over-counts BPE tokenizers on this corpus, which keeps requests under the limit.
+    """
+    return sum(1 + len(piece) // 6 for piece in TOKEN_PATTERN.findall(text))
+
+def is_throttled(error):
+    """True for 429 (rate limited) and 413 (request too large) responses"""
+    status = getattr(error, "status_code", None)
+    if status in (429, 413):
+        return True
+    error_msg = str(error).lower()
+    return "429" in error_msg or "413" in error_msg or "rate limit" in error_msg or "too large" in error_msg
+
+class AdaptiveTokenBatcher:
+    """Packs texts into embedding requests under a token budget that adapts to the provider.
+
+    A 429 or 413 halves the budget and the rejected request is re-packed under the new
+    budget and retried after a backoff; every clean response grows the budget back by a
+    quarter, up to max_tokens. One batcher is shared by all embed workers.
+    """
+
+    def __init__(self, max_tokens=EMBED_TOKEN_BUDGET, min_tokens=EMBED_MIN_TOKEN_BUDGET, max_items=EMBED_MAX_BATCH_ITEMS):
+        self.max_tokens = max_tokens
+        self.min_tokens = min(min_tokens, max_tokens)
+        self.max_items = max_items
+        self.budget = max_tokens
+        self.stats = {"requests": 0, "shrinks": 0, "lowest_budget": max_tokens}
+
+    def pack(self, indices, token_counts):
+        """Split text indices into consecutive requests within the budget and item cap.
+
+        A single text over the budget still gets a request of its own.
+        """
+        requests, current, current_tokens = [], [], 0
+        for i in indices:
+            if current and (current_tokens + token_counts[i] > self.budget or len(current) >= self.max_items):
+                requests.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += token_counts[i]
+        if current:
+            requests.append(current)
+        return requests
+
+    def shrink(self):
+        self.budget = max(self.min_tokens, self.budget // 2)
+        self.stats["shrinks"] += 1
+        self.stats["lowest_budget"] = min(self.stats["lowest_budget"], self.budget)
+
+    def grow(self):
+        self.budget = min(self.max_tokens, self.budget + max(1, self.budget // 4))
+
+    async def embed(self, embed_texts, texts):
+        """Embed texts through as many budgeted requests as needed, keeping input order"""
+        token_counts = [estimate_tokens(text) for text in texts]
+        pending = collections.deque(self.pack(range(len(texts)), token_counts))
+        results = [None] * len(texts)
+        throttles = 0
+
+        while pending:
+            request = pending.popleft()
+            try:
+                values = await with_retries(embed_texts, [texts[i] for i in request], give_up=is_throttled)
+            except Exception as e:
+                if not is_throttled(e) or throttles >= RETRY_ATTEMPTS:
+                    raise
+                throttles += 1
+                self.shrink()
+                delay = RETRY_BASE_DELAY * 2 ** (throttles - 1) * (0.5 + random.random())
+                print(f"[WARNING] {e}; token budget now {self.budget}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                pending.extendleft(reversed(self.pack(request, token_counts)))
+                continue
+
+            throttles = 0
+            self.stats["requests"] += 1
+            self.grow()
+            for i, vector in zip(request, values):
+                results[i] = vector
+
+        return results
+
+    def report(self):
+        print(f"[INFO] Token batcher: {self.stats['requests']} embedding requests, {self.stats['shrinks']} shrinks "
+              f"(lowest budget {self.stats['lowest_budget']}), budget now {self.budget} tokens")
+
+# -------------------- Concurrent Embed/Upsert Pipeline --------------------
+def _stage_stats():
+    return {"requests": 0, "items": 0, "busy_seconds": 0.0, "first_start": None, "last_end": None}
+
+def _record_stage(stage, items, started):
+    """Add one finished request to a stage's throughput counters"""
+    ended = time.perf_counter()
+    stage["requests"] += 1
+    stage["items"] += items
+    stage["busy_seconds"] += ended - started
+    stage["first_start"] = started if stage["first_start"] is None else min(stage["first_start"], started)
+    stage["last_end"] = ended if stage["last_end"] is None else max(stage["last_end"], ended)
+
+def print_stage_stats(stage_stats):
+    """Print requests, items and throughput for each pipeline stage"""
+    for name, stage in stage_stats.items():
+        if not stage["requests"]:
+            print(f"[INFO] Stage {name}: idle")
             continue
-
-def main():
-    """Main function to process all CSV files and upload embeddings"""
+        wall = max(stage["last_end"] - stage["first_start"], 1e-9)
+        print(f"[INFO] Stage {name}: {stage['requests']} requests, {stage['items']} items, "
+              f"{stage['items'] / wall:.1f} items/s, avg {stage['busy_seconds'] / stage['requests'] * 1000:.0f} ms/request")
+
+async def run_upload_pipeline(sync, batches, embed_concurrency=EMBED_CONCURRENCY,
+                              upsert_concurrency=UPSERT_CONCURRENCY, queue_size=PIPELINE_QUEUE_SIZE):
+    """Overlap embedding requests with Pinecone upserts.
+
+    The producer plans units in stream order and numbers them. embed_concurrency workers
+    embed units and hand the built vectors to upsert_concurrency workers through a queue
+    of at most queue_size units, so a slow Pinecone applies backpressure to embedding
+    instead of letting vectors pile up in memory. Vector ids are assigned by the planner,
+    so they do not depend on which worker finishes first.
+    """
+    embed_queue = asyncio.Queue(maxsize=queue_size)
+    upsert_queue = asyncio.Queue(maxsize=queue_size)
+    stage_stats = {"embed": _stage_stats(), "upsert": _stage_stats()}
+
+    async def produce():
+        unit_number = 0
+        for start, rows in iter_rows_with_ids(batches):
+            units = sync.plan(start, rows)
+            for unit in units:
+                sync.open_unit(unit)
+            sync.seal_ranges()
+            for unit in units:
+                unit_number += 1
+                await embed_queue.put((unit_number, unit))
+
+        units = sync.finish()
+        for unit in units:
+            sync.open_unit(unit)
+        sync.seal_ranges(final=True)
+        for unit in units:
+            unit_number += 1
+            await embed_queue.put((unit_number, unit))
+
+    async def embed_worker():
+        while (item := await embed_queue.get()) is not None:
+            unit_number, unit = item
+            try:
+                values_by_digest, embedded = await sync.resolve_embeddings(unit, stage_stats["embed"])
+                vectors = sync.build_vectors(unit, values_by_digest)
+            except Exception as e:
+                print(f"[ERROR] Error in batch {unit_number}: {e}")
+                sync.fail(unit)
+                sync.close_unit(unit, str(e))
+                continue
+            await upsert_queue.put((unit_number, unit, vectors, embedded))
+
+    async def upsert_worker():
+        while (item := await upsert_queue.get()) is not None:
+            unit_number, unit, vectors, embedded = item
+            error = None
+            try:
+                started = time.perf_counter()
+                await with_retries(sync.index.upsert, vectors=vectors, namespace=namespace_for(_unit_source(unit)))
+                _record_stage(stage_stats["upsert"], len(vectors), started)
+                sync.commit(unit)
+                print(f"[OK] Uploaded batch {unit_number} ({len(vectors)} vectors from {embedded} new embeddings)")
+            except Exception as e:
+                print(f"[ERROR] Error in batch {unit_number}: {e}")
+                sync.fail(unit)
+                error = str(e)
+            finally:
+                sync.close_unit(unit, error)
+
+    embedders = [asyncio.create_task(embed_worker()) for _ in range(embed_concurrency)]
+    upserters = [asyncio.create_task(upsert_worker()) for _ in range(upsert_concurrency)]
+    try:
+        await produce()
+        for _ in embedders:
+            await embed_queue.put(None)
+        await asyncio.gather(*embedders)
+
+        for _ in upserters:
+            await upsert_queue.put(None)
+        await asyncio.gather(*upserters)
+    finally:
+        for task in embedders + upserters:
+            task.cancel()
+
+    return stage_stats
+
+def batch_upload_embeddings(batches, index_name, failed_files=(), manifest_path=MANIFEST_PATH, dedup_mode=DEDUP_MODE,
+                            embed_concurrency=EMBED_CONCURRENCY, upsert_concurrency=UPSERT_CONCURRENCY,
+                            queue_size=PIPELINE_QUEUE_SIZE, journal_path=JOURNAL_PATH, resume=False,
+                            backend=VECTOR_STORE_BACKEND):
+    """Embed and upsert only new or changed rows, then delete vectors whose rows disappeared.
+
+    failed_files lists source files that could not be read this run; their vectors are
+    never treated as deleted. Committed row ranges are journaled as they settle; with
+    resume, ranges an earlier run committed are not embedded again even if that run was
+    killed before saving the manifest. Returns counts of skipped, embedded, deleted and
+    failed rows.
+    """
+    index = open_vector_index(index_name, backend)
+    journal = IngestJournal(journal_path, dataset_fingerprint(dedup_mode=dedup_mode), resume)
+    sync = EmbeddingSync(index, load_manifest(manifest_path), failed_files, dedup_mode, journal=journal)
+
+    try:
+        stage_stats = asyncio.run(run_upload_pipeline(sync, batches, embed_concurrency, upsert_concurrency, queue_size))
+        sync.prune()
+
+    finally:
+        index.save()
+        save_manifest(sync.manifest, manifest_path)
+        journal.close()
+
+    sync.report()
+    print_stage_stats(stage_stats)
+    sync.batcher.report()
+    sync.cache.report()
+    journal.report()
+    return sync.stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed the datasets/ CSV files into Pinecone or the local vector store")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip row ranges the checkpoint journal says are committed; retry failed or missing ones")
+    parser.add_argument("--backend", choices=VECTOR_STORE_BACKENDS, default=VECTOR_STORE_BACKEND,
+                        help="vector store to sync (default: VECTOR_STORE env var, else pinecone)")
+    return parser.parse_args()
+
+def main(resume=False, backend=VECTOR_STORE_BACKEND):
+    """Main function to stream all CSV files and sync changed rows to the vector store"""
     print("Starting CSV file processing and embedding...")
 
-    # Process all CSV files
-    texts, metadata = process_csv_files()
-
-    print(f"[INFO] Total texts prepared: {len(texts)}")
+    # Stream all CSV files in fixed-size batches
+    failed_files = []
+    batches = iter_csv_batches(failed_files=failed_files)
+    first_batch = next(batches, None)
 
-    if len(texts) == 0:
+    if first_batch is None:
         print("[ERROR] No valid texts found to embed!")
         return
 
-    # Upload embeddings to Pinecone
+    # Upload only new or changed embeddings
     index_name = "healthcare-embeddings"
-    batch_upload_embeddings(texts, metadata, index_name)
+    manifest_path, journal_path = sync_state_paths(backend)
+    stats = batch_upload_embeddings(itertools.chain([first_batch], batches), index_name, failed_files=failed_files,
+                                    manifest_path=manifest_path, journal_path=journal_path, resume=resume, backend=backend)
 
-    print(f"[OK] Successfully uploaded {len(texts)} embeddings to Pinecone!")
+    print(f"[OK] {backend} vector store in sync ({stats['embedded']} embedded, {stats['skipped']} unchanged, {stats['deleted']} deleted)")
 
     # Test with a sample query
-    test_query(index_name)
+    test_query(index_name, backend)
 
-def test_query(index_name):
+def test_query(index_name, backend=VECTOR_STORE_BACKEND):
     """Test the index with a sample query"""
     print("\n[INFO] Testing with sample queries...")
 
-    index = pc.Index(index_name)
+    index = LocalVectorStore() if backend == "local" else PineconeVectorStore(index_name, host=None)
 
     test_queries = [
         "fever medicine",
@@ -206,15 +830,13 @@ def test_query(index_name):
 
         try:
             query_emb = external_client.embeddings.create(
-                model="text-embedding-004",
+                model=EMBEDDING_MODEL,
                 input=query
             ).data[0].embedding
+            query_emb = project_one(EMBEDDING_MODEL, query_emb)
 
-            result = index.query(
-                vector=query_emb,
-                top_k=3,
-                include_metadata=True
-            )
+            # Rows live in per-family namespaces; the default namespace alone is empty
+            result = query_namespaces(index, query_emb, ALL_NAMESPACES, top_k=3, include_metadata=True)
 
             print("[RESULTS]")
             for i, match in enumerate(result["matches"], 1):
@@ -226,5 +848,6 @@ def test_query(index_name):
             print(f"[ERROR] Error with query '{query}': {e}")
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(resume=args.resume, backend=args.backend)
 
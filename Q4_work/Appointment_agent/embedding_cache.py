@@ -0,0 +1,241 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import List
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer at a time
+    fcntl = None
+
+# -------------------- Configuration --------------------
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join("cache", "embeddings"))
+EMBED_CACHE_MAX_BYTES = int(float(os.getenv("EMBED_CACHE_MAX_MB", "256")) * 1024 * 1024)  # per model
+EVICT_TO_FRACTION = 0.75  # a full store is compacted down to this share of its budget
+KEY_BYTES = 16  # blake2b digest size used as the cache key
+
+# -------------------- Helpers --------------------
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace; case is kept since embeddings are case-sensitive"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def cache_key(model: str, text: str) -> bytes:
+    """Content address of a (model, normalized text) pair"""
+    return hashlib.blake2b(f"{model}\0{normalize_text(text)}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+@contextlib.contextmanager
+def _file_lock(path, exclusive):
+    """Shared lock for readers, exclusive lock for writers (no-op where fcntl is missing)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# -------------------- Per-model Store --------------------
+class _ModelStore:
+    """Append-only float32 matrix (<model>.f32) plus a parallel file of 16-byte keys (<model>.keys).
+
+    Row i of the matrix belongs to key record i. A row is written and fsync'd before its key,
+    so a key on disk always points at a complete vector. Other processes pick up new rows by
+    re-reading the key file tail; a compaction replaces both files and is seen as a new inode.
+    """
+
+    def __init__(self, directory, model, max_bytes):
+        base = os.path.join(directory, re.sub(r"[^A-Za-z0-9._-]", "_", model))
+        self.data_path = base + ".f32"
+        self.keys_path = base + ".keys"
+        self.meta_path = base + ".json"
+        self.lock_path = base + ".lock"
+        self.max_bytes = max_bytes
+        self.mutex = threading.RLock()
+        self.dim = None
+        self.identity = None
+        self.slots = {}  # key -> row
+        self.rows = 0
+        self.matrix = None
+        self.last_used = {}  # row -> tick of the last hit in this process, used to pick survivors
+        self.tick = 0
+
+    def _identity(self):
+        try:
+            stat = os.stat(self.keys_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def _refresh(self):
+        """Load keys appended since the last call, or everything after a compaction"""
+        identity = self._identity()
+        if identity is None:
+            return
+        if identity != self.identity:
+            self.identity, self.slots, self.rows, self.matrix, self.last_used = identity, {}, 0, None, {}
+        if self.dim is None:
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.rows * KEY_BYTES)
+            tail = f.read()
+        for offset in range(0, len(tail) - len(tail) % KEY_BYTES, KEY_BYTES):
+            self.slots[tail[offset:offset + KEY_BYTES]] = self.rows
+            self.rows += 1
+
+    def _view(self):
+        """Read-only memory map covering every known row (remapped only when rows were added)"""
+        if self.matrix is None or len(self.matrix) < self.rows:
+            self.matrix = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self.matrix
+
+    def get_many(self, keys):
+        with self.mutex:
+            if any(key not in self.slots for key in keys):
+                with _file_lock(self.lock_path, exclusive=False):
+                    self._refresh()
+            if not self.rows:
+                return [None] * len(keys)
+            matrix = self._view()
+            found = []
+            for key in keys:
+                row = self.slots.get(key)
+                if row is not None:
+                    self.tick += 1
+                    self.last_used[row] = self.tick
+                found.append(None if row is None else matrix[row])
+            return found
+
+    def put_many(self, keys, vectors):
+        """Append vectors for unseen keys; returns (rows written, rows evicted)"""
+        with self.mutex, _file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            fresh = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.slots and key not in fresh:
+                    fresh[key] = vector
+            if not fresh:
+                return 0, 0
+
+            matrix = np.asarray(list(fresh.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                with open(self.meta_path + ".tmp", "w") as f:
+                    json.dump({"dim": self.dim}, f)
+                os.replace(self.meta_path + ".tmp", self.meta_path)
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {matrix.shape[1]}")
+
+            row_bytes = self.dim * 4
+            evicted = 0
+            if (self.rows + len(fresh)) * row_bytes > self.max_bytes:
+                evicted = self._compact(max(0, int(self.max_bytes * EVICT_TO_FRACTION) // row_bytes - len(fresh)))
+
+            # Write at the end of the known rows, overwriting any half-written tail from a crash
+            with open(self.data_path, "r+b" if os.path.exists(self.data_path) else "w+b") as f:
+                f.seek(self.rows * row_bytes)
+                f.write(matrix.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(fresh))
+
+            if self.identity is None:
+                self.identity = self._identity()
+            for key in fresh:
+                self.slots[key] = self.rows
+                self.rows += 1
+            return len(fresh), evicted
+
+    def _compact(self, keep):
+        """Rewrite both files with the `keep` most valuable rows: recently hit first, then newest"""
+        ranked = sorted(self.slots.items(), key=lambda item: (self.last_used.get(item[1], 0), item[1]), reverse=True)
+        survivors = sorted(ranked[:keep], key=lambda item: item[1])
+        matrix = self._view() if self.rows else None
+
+        with open(self.data_path + ".tmp", "wb") as f:
+            for _, row in survivors:
+                f.write(matrix[row].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.keys_path + ".tmp", "wb") as f:
+            f.write(b"".join(key for key, _ in survivors))
+        os.replace(self.data_path + ".tmp", self.data_path)
+        os.replace(self.keys_path + ".tmp", self.keys_path)
+
+        evicted = len(self.slots) - len(survivors)
+        self.identity = self._identity()
+        self.slots = {key: new_row for new_row, (key, _) in enumerate(survivors)}
+        self.last_used = {}
+        self.rows = len(survivors)
+        self.matrix = None
+        return evicted
+
+# -------------------- Embedding Cache --------------------
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, normalized text hash).
+
+    Hits are zero-copy read-only views into a memory-mapped float32 file, so any number of
+    processes can share one warm cache. Each model's store is bounded by max_bytes.
+    """
+
+    def __init__(self, directory=EMBED_CACHE_DIR, max_bytes=EMBED_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stores = {}
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self.mutex = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _store(self, model):
+        with self.mutex:
+            if model not in self.stores:
+                self.stores[model] = _ModelStore(self.directory, model, self.max_bytes)
+            return self.stores[model]
+
+    def get_many(self, model: str, texts: List[str]) -> list:
+        """Cached vectors in input order, None where the text has not been embedded yet"""
+        found = self._store(model).get_many([cache_key(model, text) for text in texts])
+        hits = sum(vector is not None for vector in found)
+        with self.mutex:
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(found) - hits
+        return found
+
+    def get(self, model: str, text: str):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], vectors) -> int:
+        written, evicted = self._store(model).put_many([cache_key(model, text) for text in texts], vectors)
+        with self.mutex:
+            self.stats["writes"] += written
+            self.stats["evictions"] += evicted
+        return written
+
+    def put(self, model: str, text: str, vector) -> int:
+        return self.put_many(model, [text], [vector])
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def report(self):
+        print(f"[INFO] Embedding cache: {self.stats['hits']} hits, {self.stats['misses']} misses "
+              f"({self.hit_rate():.1%} hit rate), {self.stats['writes']} writes, {self.stats['evictions']} evicted")
+
+_shared_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache instance"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = EmbeddingCache()
+    return _shared_cache
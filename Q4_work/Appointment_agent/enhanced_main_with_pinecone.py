@@ -5,7 +5,9 @@ import requests
 import asyncio
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from pinecone import Pinecone
+from vector_store import VECTOR_STORE_BACKEND, get_vector_store, query_namespaces
+from namespaces import SYMPTOM_NAMESPACES, namespaces_for_query
+from projection import PROJECTION_ENABLED, project_one
 from typing import Dict, List
 import openai
 
@@ -24,14 +26,8 @@ healthcare_index = None
 embedding_client = None
 
 try:
-    # Initialize Pinecone
-    pc = Pinecone(
-        api_key=os.getenv("PINECONE_API_KEY"),
-        environment="us-west1-gcp"
-    )
-
-    index_name = "healthcare-embeddings"
-    healthcare_index = pc.Index(index_name, host="https://healthcare-embeddings-locsd7i.svc.aped-4627-b74a.pinecone.io")
+    # Initialize the configured vector store (VECTOR_STORE=pinecone or local)
+    healthcare_index = get_vector_store(VECTOR_STORE_BACKEND)
 
     # Initialize OpenAI client for embeddings
     embedding_client = openai.OpenAI(
@@ -39,7 +35,7 @@ try:
     )
 
     PINECONE_AVAILABLE = True
-    st.success("✅ Pinecone vector database connected successfully")
+    st.success(f"✅ {VECTOR_STORE_BACKEND.title()} vector database connected successfully")
 
 except Exception as e:
     st.error(f"⚠️ Pinecone connection failed: {e}")
@@ -60,6 +56,8 @@ def create_embedding(text: str) -> List[float]:
             input=text
         )
         embedding = response.data[0].embedding
+        if PROJECTION_ENABLED:
+            return project_one("text-embedding-ada-002", embedding)  # fitted map into the index's shared space
         # Truncate or pad to 768 dimensions to match the index
         return embedding[:768]  # Take first 768 dimensions
     except Exception as e:
@@ -77,11 +75,7 @@ def search_medical_information(query: str, top_k: int = 3) -> str:
 
         # Search Pinecone
         with st.spinner("🔍 Searching medical database..."):
-            search_results = healthcare_index.query(
-                vector=query_embedding,
-                top_k=top_k,
-                include_metadata=True
-            )
+            search_results = query_namespaces(healthcare_index, query_embedding, namespaces_for_query(query), top_k=top_k)
 
         if not search_results.get("matches"):
             return f"📚 **Medical Information: {query}**\n\nNo specific information found in our database for '{query}'. Please consult a healthcare professional for accurate medical advice."
@@ -129,11 +123,7 @@ def analyze_symptoms_advanced(symptoms: str) -> str:
 
         # Search for relevant medical information
         with st.spinner("🔍 Searching medical knowledge base..."):
-            search_results = healthcare_index.query(
-                vector=symptoms_embedding,
-                top_k=5,
-                include_metadata=True
-            )
+            search_results = query_namespaces(healthcare_index, symptoms_embedding, SYMPTOM_NAMESPACES, top_k=5)
 
         # Build comprehensive analysis
         symptom_analysis = f"🩺 **Advanced Symptom Analysis**\n\n"
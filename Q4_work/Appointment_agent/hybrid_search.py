@@ -0,0 +1,164 @@
+import glob
+import hashlib
+import os
+import pickle
+import re
+import time
+from typing import Dict, List
+import numpy as np
+from dataset_texts import DATASETS_DIR, iter_csv_rows
+from namespaces import namespace_for
+
+# -------------------- Configuration --------------------
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH", "1") != "0"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # reciprocal-rank fusion constant: score = sum(1 / (RRF_K + rank))
+BM25_CACHE_DIR = "cache"
+BM25_INDEX_VERSION = 3  # bump when the pickled BM25Index layout or tokenization changes
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+FIELD_LABELS = {"weight"}  # labelled numbers that are not 0/1 symptom flags (Symptom-severity.csv)
+
+# -------------------- Tokenizer --------------------
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+def tokenize_document(text: str) -> List[str]:
+    """Tokens of the field values of a prepared row text.
+
+    The 'Source: <file>' piece and field labels ('Disease:', 'Symptoms:') are dropped: they
+    repeat on every row of a file and would match generic words like "symptoms" or "disease"
+    everywhere. Training.csv flags are the exception: there the label is the symptom, so
+    'itching: 1' indexes "itching" and 'itching: 0' (an absent symptom) indexes nothing.
+    """
+    tokens = []
+    for piece in text.split(" | "):
+        label, separator, value = piece.partition(": ")
+        if not separator:
+            tokens.extend(tokenize(piece))
+        elif label == "Source" or value == "0":
+            continue
+        elif value == "1" and label not in FIELD_LABELS:
+            tokens.extend(tokenize(label))
+        else:
+            tokens.extend(tokenize(value))
+    return tokens
+
+# -------------------- BM25 Index --------------------
+class BM25Index:
+    """Okapi BM25 over the unique texts prepare_text_from_row produces.
+
+    Postings are stored per term as (doc ids, precomputed BM25 weights), so a query is a
+    handful of vectorized adds over short arrays plus a partial sort.
+    """
+
+    def __init__(self, texts: List[str], metadata: List[Dict]):
+        self.texts = texts
+        self.metadata = metadata
+        self.namespace_masks = {}  # namespace -> bool mask of its documents
+        for doc, meta in enumerate(metadata):
+            mask = self.namespace_masks.setdefault(namespace_for(meta["source_file"]), np.zeros(len(texts), dtype=bool))
+            mask[doc] = True
+        doc_tokens = [tokenize_document(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        term_docs = {}
+        for doc, tokens in enumerate(doc_tokens):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                term_docs.setdefault(token, ([], []))
+                term_docs[token][0].append(doc)
+                term_docs[token][1].append(tf)
+
+        self.postings = {}
+        doc_count = len(texts)
+        for term, (docs, tfs) in term_docs.items():
+            docs = np.array(docs, dtype=np.int32)
+            tfs = np.array(tfs, dtype=np.float32)
+            idf = np.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / avg_length)
+            self.postings[term] = (docs, (idf * tfs * (BM25_K1 + 1) / (tfs + norm)).astype(np.float32))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query: str, top_k: int = 10, namespaces: List[str] = None) -> List[Dict]:
+        """Top-k documents as {"id", "score", "metadata"} matches, best first, optionally within namespaces"""
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]  # a doc appears once per posting list
+                matched = True
+        if not matched:
+            return []
+        if namespaces is not None:
+            allowed = np.zeros(len(self.texts), dtype=bool)
+            for namespace in namespaces:
+                if namespace in self.namespace_masks:
+                    allowed |= self.namespace_masks[namespace]
+            scores[~allowed] = 0
+
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": f"bm25_{doc}", "score": float(scores[doc]), "metadata": self.metadata[doc]} for doc in top]
+
+def _datasets_key() -> str:
+    """Cache key that changes whenever a dataset file changes"""
+    stats = sorted((os.path.basename(path), os.path.getsize(path), os.stat(path).st_mtime_ns)
+                   for path in glob.glob(os.path.join(DATASETS_DIR, "*.csv")))
+    return hashlib.md5(repr(stats).encode()).hexdigest()
+
+def build_bm25_index() -> BM25Index:
+    """Index every distinct row text once, keeping the first row's metadata"""
+    texts, metadata, seen = [], [], set()
+    for chunk_texts, chunk_metadata in iter_csv_rows():
+        for text, meta in zip(chunk_texts, chunk_metadata):
+            if text not in seen:
+                seen.add(text)
+                texts.append(text)
+                metadata.append(meta)
+    return BM25Index(texts, metadata)
+
+def load_bm25_index(cache_dir: str = BM25_CACHE_DIR) -> BM25Index:
+    """Load the pickled index for the current datasets, building and caching it when missing"""
+    cache_file = os.path.join(cache_dir, f"bm25_v{BM25_INDEX_VERSION}_{_datasets_key()}.pkl")
+    if os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+
+    started = time.perf_counter()
+    index = build_bm25_index()
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + ".tmp", "wb") as f:
+        pickle.dump(index, f)
+    os.replace(cache_file + ".tmp", cache_file)
+    print(f"[OK] Built BM25 index over {len(index)} texts in {time.perf_counter() - started:.2f}s")
+    return index
+
+# -------------------- Rank Fusion --------------------
+def reciprocal_rank_fusion(result_lists: Dict[str, List[Dict]], top_k: int, k: int = RRF_K) -> List[Dict]:
+    """Merge ranked match lists (keyed by retriever name) into one list by reciprocal-rank fusion.
+
+    Matches are identified by their text, so the same row found by both retrievers (or stored
+    under several vector ids) is counted once. Each fused match keeps its per-retriever scores.
+    """
+    fused = {}
+    for retriever, matches in result_lists.items():
+        for rank, match in enumerate(matches, 1):
+            text = match["metadata"].get("text", match["id"])
+            entry = fused.get(text)
+            if entry is None:
+                entry = fused[text] = {"id": match["id"], "score": 0.0, "metadata": match["metadata"], "scores": {}}
+            if retriever not in entry["scores"]:
+                entry["scores"][retriever] = match.get("score", 0)
+                entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:top_k]
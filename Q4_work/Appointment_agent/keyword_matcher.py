@@ -0,0 +1,149 @@
+import argparse
+import functools
+import re
+import time
+from typing import Dict, FrozenSet, List
+
+# -------------------- Keyword Tables --------------------
+# Every keyword list used for routing, validation, fallbacks and doctor suggestions lives here,
+# so one matcher built at import answers all of them from a single scan of the message.
+KEYWORD_TABLES: Dict[str, List[str]] = {
+    # Routed to triage and never served from the answer cache
+    "emergency": ["emergency", "urgent", "chest pain", "difficulty breathing", "severe pain", "bleeding",
+                  "unconscious", "suicide", "overdose", "stroke", "heart attack", "seizure"],
+    "medical_info": ["what is", "tell me about", "information", "explain", "learn about", "medical info"],
+    "info_request": ["what is", "tell me about", "information"],
+    "symptom": [
+        "symptom", "pain", "feeling", "diagnosis", "i have", "i'm experiencing", "hurts",
+        "fever", "headache", "cough", "nausea", "sore throat", "fatigue", "weakness",
+        "dizziness", "rash", "swelling", "breathing", "chest", "stomach", "back",
+        "migraine", "vomiting", "diarrhea", "cold", "flu", "allergy", "burning",
+        "numbness", "tingling", "stiffness", "cramps", "bloating"
+    ],
+    "booking": ["book", "appointment", "schedule", "reserve", "see doctor", "visit"],
+    "harmful": ["hack", "exploit", "malicious", "virus"],
+    # get_fallback_response topics
+    "fever": ["fever"],
+    "headache": ["headache"],
+    "booking_fallback": ["book", "appointment"],
+    # analyze_symptoms doctor suggestions when the local scorer has no specialty
+    "cardiology": ["chest pain", "heart", "palpitation", "blood pressure"],
+    "neurology": ["headache", "migraine", "dizziness", "brain"],
+    "dermatology": ["skin", "rash", "acne", "dermatology"],
+    # Disease card sections a question asks for ("what should I eat / take / avoid"), or the whole card
+    "card_overview": ["what is", "what's", "tell me about", "information", "explain", "overview"],
+    "card_symptoms": ["symptom", "signs", "warning sign", "how do i know", "what does it feel"],
+    "card_diet": [" eat", "food", "diet", "meal", "nutrition"],
+    "card_medications": [" take", "medicine", "medication", "drug", "tablet", "pill", "treatment", "cure"],
+    "card_precautions": ["avoid", "precaution", "prevent", "careful", "should not", "shouldn't"],
+    "card_workout": ["exercise", "workout", "lifestyle", "activity"],
+}
+
+# -------------------- Matcher --------------------
+def trie_pattern(words: List[str]) -> str:
+    """Regex alternation of words factored into a character trie, so each position tries only
+    the branches sharing its first characters (the regex equivalent of an Aho-Corasick goto table)"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body  # greedy: longest keyword at a position wins
+
+    return build(trie)
+
+class KeywordMatcher:
+    """All keyword categories of a text from one regex scan.
+
+    Keeps the semantics of `any(keyword in text.lower() for keyword in table)` for every table:
+    a zero-width lookahead tries the keyword trie at every position, so overlapping keywords are
+    all seen, and the longest keyword found at a position carries the categories of every
+    shorter keyword it starts with ("chest pain" also reports "chest").
+    """
+
+    def __init__(self, tables: Dict[str, List[str]]):
+        self.tables = tables
+        categories = {}
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                categories.setdefault(keyword.lower(), set()).add(category)
+        keywords = sorted(categories, key=len, reverse=True)
+        self.categories = {
+            keyword: frozenset().union(*(categories[other] for other in keywords if keyword.startswith(other)))
+            for keyword in keywords
+        }
+        self.pattern = re.compile("(?=(" + trie_pattern(keywords) + "))")
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Every category with at least one keyword in text"""
+        hits = set()
+        for keyword in set(self.pattern.findall(text.lower())):
+            hits |= self.categories[keyword]
+        return frozenset(hits)
+
+    def match_chains(self, text: str) -> FrozenSet[str]:
+        """The same answer from one `keyword in text` chain per table (reference for the benchmark)"""
+        lowered = text.lower()
+        return frozenset(category for category, keywords in self.tables.items()
+                         if any(keyword in lowered for keyword in keywords))
+
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_TABLES)
+
+@functools.lru_cache(maxsize=256)
+def match_keywords(text: str) -> FrozenSet[str]:
+    """Keyword categories of a message; memoized so the call sites of one request share one scan"""
+    return KEYWORD_MATCHER.match(text)
+
+# -------------------- Benchmark --------------------
+SAMPLE_MESSAGES = [
+    "I have chest pain", "fever,headache", "What is hypertension", "Find cardiologist in Karachi",
+    "I want to book an appointment with a neurologist tomorrow", "hello",
+    "I've had a dry cough, sore throat and mild fever for three days, what should I do?",
+    "my skin has an itchy rash and some acne on the back",
+    "Tell me about diabetes and how blood pressure affects the heart",
+    "how do I hack the appointment system", "difficulty breathing and dizziness after exercise",
+    "I'm experiencing numbness and tingling in my left arm since yesterday evening",
+]
+
+def run_benchmark(messages: List[str], repeat: int = 2000) -> Dict:
+    """Per-message time of one table chain per category (as the call sites did) vs the single scan"""
+    matcher = KEYWORD_MATCHER
+    mismatches = [text for text in messages if matcher.match(text) != matcher.match_chains(text)]
+    timings = {}
+    for name, function in (("chains", matcher.match_chains), ("matcher", matcher.match)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for text in messages:
+                function(text)
+        timings[name] = (time.perf_counter() - started) / (repeat * len(messages)) * 1e6
+    return {"messages": len(messages), "mismatches": mismatches,
+            "chains_us": round(timings["chains"], 2), "matcher_us": round(timings["matcher"], 2)}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the keyword matcher against per-table chains")
+    parser.add_argument("--messages", help="Text file with one message per line (default: built-in samples)")
+    parser.add_argument("--repeat", type=int, default=2000)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    messages = SAMPLE_MESSAGES
+    if args.messages:
+        with open(args.messages, encoding="utf-8") as f:
+            messages = [line.strip() for line in f if line.strip()]
+    keyword_count = sum(len(keywords) for keywords in KEYWORD_TABLES.values())
+    result = run_benchmark(messages, args.repeat)
+    print(f"[INFO] {keyword_count} keywords in {len(KEYWORD_TABLES)} categories, {result['messages']} messages")
+    print(f"[INFO] chains: {result['chains_us']}us/message  matcher: {result['matcher_us']}us/message "
+          f"({result['chains_us'] / result['matcher_us']:.1f}x)")
+    for text in result["mismatches"]:
+        print(f"[ERROR] Categories differ for: {text}")
+    if not result["mismatches"]:
+        print("[OK] Matcher agrees with the chains on every message")
@@ -0,0 +1,108 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+import numpy as np
+
+# -------------------- Configuration --------------------
+LATENCY_SNAPSHOT_PATH = os.getenv("LATENCY_SNAPSHOT_PATH", os.path.join("cache", "latency_snapshot.json"))
+# Log-spaced bucket edges from 10us to 2min (~12% apart), so percentiles are within one bucket width
+BUCKET_EDGES_MS = np.geomspace(0.01, 120000, 141).tolist()
+PERCENTILES = (50, 95, 99)
+
+# Agent the current request was routed to; asyncio tasks spawned for tool calls inherit it
+current_agent = contextvars.ContextVar("current_agent", default="direct")
+
+# -------------------- Histogram --------------------
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: constant memory, O(log buckets) per sample"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKET_EDGES_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bucket holding the q-th percentile sample (capped at the observed max)"""
+        if not self.count:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        edge = BUCKET_EDGES_MS[bucket] if bucket < len(BUCKET_EDGES_MS) else self.max_ms
+        return min(edge, self.max_ms)
+
+    def summary(self) -> Dict:
+        summary = {"count": self.count, "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0}
+        for q in PERCENTILES:
+            summary[f"p{q}_ms"] = round(self.percentile(q), 3)
+        summary["max_ms"] = round(self.max_ms, 3)
+        return summary
+
+# -------------------- Recorder --------------------
+_histograms = {}  # (stage, agent) -> LatencyHistogram
+_mutex = threading.Lock()
+
+def record(stage: str, ms: float, agent: str = None):
+    """Add one duration for a stage, attributed to the given or current agent"""
+    key = (stage, agent or current_agent.get())
+    with _mutex:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = LatencyHistogram()
+        histogram.record(ms)
+
+@contextlib.contextmanager
+def span(stage: str):
+    """Time the enclosed block as one sample of stage (recorded even when it raises)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - started) * 1000)
+
+def latency_snapshot() -> Dict:
+    """{stage: {agent: summary}} including an "all" roll-up per stage"""
+    with _mutex:
+        items = [(stage, agent, histogram.summary(), histogram) for (stage, agent), histogram in _histograms.items()]
+        snapshot = {}
+        rollups = {}
+        for stage, agent, summary, histogram in sorted(items, key=lambda item: (item[0], item[1])):
+            snapshot.setdefault(stage, {})[agent] = summary
+            rollup = rollups.setdefault(stage, LatencyHistogram())
+            rollup.counts = [a + b for a, b in zip(rollup.counts, histogram.counts)]
+            rollup.count += histogram.count
+            rollup.total_ms += histogram.total_ms
+            rollup.max_ms = max(rollup.max_ms, histogram.max_ms)
+        for stage, rollup in rollups.items():
+            snapshot[stage]["all"] = rollup.summary()
+    return snapshot
+
+def export_latency_snapshot(path: str = LATENCY_SNAPSHOT_PATH) -> str:
+    """Write the snapshot as JSON and return the path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "stages": latency_snapshot()}, f, indent=2)
+    return path
+
+def reset_latency():
+    with _mutex:
+        _histograms.clear()
+
+def report():
+    for stage, agents in latency_snapshot().items():
+        overall = agents["all"]
+        print(f"[INFO] {stage}: n={overall['count']} p50={overall['p50_ms']}ms "
+              f"p95={overall['p95_ms']}ms p99={overall['p99_ms']}ms max={overall['max_ms']}ms")
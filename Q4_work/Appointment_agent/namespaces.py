@@ -0,0 +1,52 @@
+import re
+from typing import List
+
+# -------------------- Source Families --------------------
+# One vector store namespace per source family; ingestion writes each CSV into its family's namespace
+SOURCE_NAMESPACES = {
+    "description.csv": "descriptions",
+    "medications.csv": "medications",
+    "precautions_df.csv": "precautions",
+    "diets.csv": "diets",
+    "workout_df.csv": "workouts",
+    "symptoms_df.csv": "symptoms",
+    "Symptom-severity.csv": "symptoms",
+    "Training.csv": "training",
+    "Doctors_in_Pakistancsv.csv": "doctors",
+}
+DEFAULT_NAMESPACE = "general"  # CSVs added to datasets/ without a family yet
+ALL_NAMESPACES = sorted(set(SOURCE_NAMESPACES.values()) | {DEFAULT_NAMESPACE})
+
+# Medical namespaces searched when a question has no recognisable intent (doctors need an explicit ask)
+MEDICAL_NAMESPACES = [ns for ns in ALL_NAMESPACES if ns != "doctors"]
+SYMPTOM_NAMESPACES = ["symptoms", "training", "descriptions"]
+
+# -------------------- Query Intents --------------------
+# Regex fragments matched as whole words; inflections that should count are spelled out
+# so "care" does not match "career" nor "drug" match "drugstore"
+INTENT_NAMESPACES = [
+    ((r"treatments?", r"treat(?:s|ed|ing)?", r"cures?", r"medicines?", r"medications?", r"drugs?", r"tablets?",
+      r"remed(?:y|ies)", r"therap(?:y|ies)"), ["medications", "precautions"]),
+    ((r"diets?", r"foods?", r"eat(?:s|ing)?", r"nutrition", r"meals?"), ["diets"]),
+    ((r"exercis(?:e|es|ing)", r"workouts?", r"activit(?:y|ies)", r"fitness", r"yoga"), ["workouts"]),
+    ((r"precautions?", r"prevent(?:s|ed|ing|ion)?", r"avoid(?:s|ed|ing)?", r"care(?:ful)?", r"safety"), ["precautions"]),
+    ((r"symptoms?", r"signs?", r"feel(?:s|ing)?", r"pains?", r"painful", r"aches?", r"aching", r"fever(?:s|ish)?",
+      r"itch(?:y|es|ing)?", r"rash(?:es)?", r"cough(?:s|ing)?"), SYMPTOM_NAMESPACES),
+    ((r"doctors?", r"specialists?", r"hospitals?", r"clinics?", r"consult(?:s|ed|ing|ation)?", r"physicians?"), ["doctors"]),
+    ((r"what is", r"caus(?:e|es|ed)", r"descriptions?", r"overview", r"about"), ["descriptions"]),
+]
+INTENT_PATTERNS = [(re.compile(r"\b(?:" + "|".join(keywords) + r")\b"), namespaces)
+                   for keywords, namespaces in INTENT_NAMESPACES]
+
+def namespace_for(source_file: str) -> str:
+    """Namespace a dataset file is ingested into"""
+    return SOURCE_NAMESPACES.get(source_file, DEFAULT_NAMESPACE)
+
+def namespaces_for_query(query: str) -> List[str]:
+    """Namespaces relevant to a question, in intent order; all medical namespaces when no intent matches"""
+    text = query.lower()
+    selected = []
+    for pattern, namespaces in INTENT_PATTERNS:
+        if pattern.search(text):
+            selected.extend(ns for ns in namespaces if ns not in selected)
+    return selected or list(MEDICAL_NAMESPACES)
@@ -2,9 +2,13 @@ import streamlit as st
 import os
 import json
 from dotenv import load_dotenv
-from pinecone import Pinecone
+from vector_store import VECTOR_STORE_BACKEND, get_vector_store, query_namespaces
+from namespaces import SYMPTOM_NAMESPACES, namespaces_for_query
 from typing import Dict, List
 import openai
+from embedding_cache import get_embedding_cache
+from projection import PROJECTION_ENABLED, project_one
+from triage import keyword_urgency, load_triage
 
 # -------------------- Load Environment --------------------
 load_dotenv()
@@ -14,19 +18,25 @@ PINECONE_AVAILABLE = False
 healthcare_index = None
 embedding_client = None
 
+# -------------------- Severity Triage --------------------
+try:
+    severity_triage = load_triage()
+except Exception as e:
+    print(f"[WARNING] Severity triage unavailable, using emergency keywords only: {e}")
+    severity_triage = None
+
+def assess_urgency(symptoms: str) -> Dict:
+    """Urgency tier from Symptom-severity.csv weights (local, no network)"""
+    if severity_triage is not None:
+        return severity_triage.assess(symptoms)
+    return keyword_urgency(symptoms, default="medium")
+
 def initialize_pinecone():
-    """Initialize Pinecone connection"""
+    """Initialize the configured vector store (VECTOR_STORE=pinecone or local)"""
     global PINECONE_AVAILABLE, healthcare_index, embedding_client
 
     try:
-        # Initialize Pinecone
-        pc = Pinecone(
-            api_key=os.getenv("PINECONE_API_KEY"),
-            environment="us-west1-gcp"
-        )
-
-        index_name = "healthcare-embeddings"
-        healthcare_index = pc.Index(index_name, host="https://healthcare-embeddings-locsd7i.svc.aped-4627-b74a.pinecone.io")
+        healthcare_index = get_vector_store(VECTOR_STORE_BACKEND)
 
         # Initialize OpenAI client for embeddings
         embedding_client = openai.OpenAI(
@@ -142,28 +152,32 @@ def create_embedding(text: str) -> List[float]:
         raise Exception("Embedding client not available")
 
     try:
+        cache = get_embedding_cache()
+        cached = cache.get("text-embedding-ada-002", text)
+        if cached is not None:
+            return project_one("text-embedding-ada-002", cached.tolist()) if PROJECTION_ENABLED else cached[:768].tolist()
+
         response = embedding_client.embeddings.create(
             model="text-embedding-ada-002",
             input=text
         )
         embedding = response.data[0].embedding
+        cache.put("text-embedding-ada-002", text, embedding)
+        if PROJECTION_ENABLED:
+            return project_one("text-embedding-ada-002", embedding)  # fitted map into the index's shared space
         return embedding[:768]  # Truncate to 768 dimensions
     except Exception as e:
         raise Exception(f"Failed to create embedding: {e}")
 
-def search_medical_knowledge(query: str, top_k: int = 5) -> List[Dict]:
-    """Search medical knowledge using Pinecone"""
+def search_medical_knowledge(query: str, top_k: int = 5, namespaces: List[str] = None) -> List[Dict]:
+    """Search medical knowledge using Pinecone, only in the namespaces the query needs"""
     if not PINECONE_AVAILABLE:
         return []
 
     try:
         query_embedding = create_embedding(query)
 
-        search_results = healthcare_index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
+        search_results = query_namespaces(healthcare_index, query_embedding, namespaces or namespaces_for_query(query), top_k=top_k)
 
         results = []
         for match in search_results.get("matches", []):
@@ -183,18 +197,12 @@ def search_medical_knowledge(query: str, top_k: int = 5) -> List[Dict]:
 
 def analyze_symptoms_with_ai(symptoms: str) -> Dict:
     """Analyze symptoms using Pinecone AI"""
-    if not PINECONE_AVAILABLE:
+    # Check for emergency symptoms first (local, so it works even without Pinecone)
+    urgency = assess_urgency(symptoms)
+    if urgency["tier"] == "emergency":
+        warning_signs = f"\n\n**Warning signs reported:** {', '.join(urgency['red_flags'])}" if urgency["red_flags"] else ""
         return {
-            "analysis": "AI symptom analysis is currently unavailable. Please consult a healthcare professional directly.",
-            "recommendations": ["Consult with Dr. Ahmed Khan (Cardiologist) or Dr. Khan (Neurologist) for evaluation."],
-            "urgency": "medium"
-        }
-
-    # Check for emergency symptoms first
-    emergency_keywords = ["chest pain", "difficulty breathing", "severe pain", "emergency", "unconscious", "stroke", "bleeding"]
-    if any(keyword in symptoms.lower() for keyword in emergency_keywords):
-        return {
-            "analysis": "🚨 **EMERGENCY - IMMEDIATE MEDICAL ATTENTION REQUIRED**\n\nBased on your symptoms, you may be experiencing a medical emergency.",
+            "analysis": "🚨 **EMERGENCY - IMMEDIATE MEDICAL ATTENTION REQUIRED**\n\nBased on your symptoms, you may be experiencing a medical emergency." + warning_signs,
             "recommendations": [
                 "Call emergency services immediately (1122 in Pakistan)",
                 "Go to the nearest emergency room",
@@ -203,10 +211,17 @@ def analyze_symptoms_with_ai(symptoms: str) -> Dict:
             "urgency": "emergency"
         }
 
+    if not PINECONE_AVAILABLE:
+        return {
+            "analysis": "AI symptom analysis is currently unavailable. Please consult a healthcare professional directly.",
+            "recommendations": ["Consult with Dr. Ahmed Khan (Cardiologist) or Dr. Khan (Neurologist) for evaluation."],
+            "urgency": urgency["tier"]
+        }
+
     try:
         # Search for relevant medical information
         enhanced_query = f"symptoms diagnosis medical conditions treatment {symptoms} healthcare"
-        search_results = search_medical_knowledge(enhanced_query, top_k=5)
+        search_results = search_medical_knowledge(enhanced_query, top_k=5, namespaces=SYMPTOM_NAMESPACES)
 
         # Build analysis
         analysis = f"**Symptom Analysis**\n\n**Reported Symptoms:** {symptoms}\n\n"
@@ -253,17 +268,14 @@ def analyze_symptoms_with_ai(symptoms: str) -> Dict:
             "If symptoms worsen, seek immediate medical attention"
         ]
 
-        urgency = "medium"
-        if any(keyword in symptoms_lower for keyword in ["severe", "worst", "unbearable"]):
-            urgency = "high"
-        elif any(keyword in symptoms_lower for keyword in ["mild", "slight", "minor"]):
-            urgency = "low"
+        if urgency["score"]:
+            analysis += f"**Severity score:** {urgency['score']} ({', '.join(urgency['symptoms'])})\n\n"
 
         return {
             "analysis": analysis,
             "recommendations": recommendations,
             "next_steps": next_steps,
-            "urgency": urgency,
+            "urgency": urgency["tier"],
             "search_results": search_results[:3]  # Top 3 results for display
         }
 
@@ -0,0 +1,200 @@
+import argparse
+import hashlib
+import os
+import re
+from typing import Dict, List
+import numpy as np
+
+# -------------------- Configuration --------------------
+# Every supported embedding model is mapped into one compact shared space, so a single index
+# serves ingestion (text-embedding-004) and the query paths (text-embedding-3-small, ada-002).
+# Index and queries must agree: enable only with an index built from projected vectors.
+PROJECTION_ENABLED = os.getenv("EMBED_PROJECTION", "0") == "1"
+PROJECTION_DIR = os.getenv("EMBED_PROJECTION_DIR", "projections")
+REFERENCE_MODEL = "text-embedding-004"  # the shared space is the PCA of this model's embeddings
+SHARED_DIM = int(os.getenv("SHARED_EMBEDDING_DIM", "256"))
+SUPPORTED_MODELS = {"text-embedding-004": 768, "text-embedding-3-small": 1536, "text-embedding-ada-002": 1536}
+ALIGNMENT_RIDGE = 1e-2  # regularisation of the least-squares alignment, relative to mean feature variance
+FIT_HOLDOUT = 0.2  # share of fitting texts kept back to score the alignment
+
+# -------------------- Projection --------------------
+class Projection:
+    """Affine map of one model's embeddings into the shared space: unit((x - mean) @ matrix)"""
+
+    def __init__(self, model: str, mean, matrix):
+        self.model = model
+        self.mean = np.asarray(mean, dtype=np.float32)  # (input_dim,)
+        self.matrix = np.asarray(matrix, dtype=np.float32)  # (input_dim, output_dim)
+
+    @property
+    def input_dim(self):
+        return self.matrix.shape[0]
+
+    @property
+    def output_dim(self):
+        return self.matrix.shape[1]
+
+    def coordinates(self, vectors) -> np.ndarray:
+        """Un-normalized shared-space coordinates of (n, input_dim) vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.input_dim:
+            raise ValueError(f"{self.model} projection expects {self.input_dim} dimensions, got {vectors.shape[-1]}")
+        return (vectors - self.mean) @ self.matrix
+
+    def apply(self, vectors) -> np.ndarray:
+        coords = self.coordinates(vectors)
+        norms = np.linalg.norm(coords, axis=-1, keepdims=True)
+        return coords / np.where(norms == 0, 1, norms)
+
+    def digest(self) -> str:
+        return hashlib.md5(self.mean.tobytes() + self.matrix.tobytes()).hexdigest()[:8]
+
+    def save(self, path):
+        np.savez(path, model=self.model, mean=self.mean, matrix=self.matrix)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(str(saved["model"]), saved["mean"], saved["matrix"])
+
+def projection_path(model: str, directory=PROJECTION_DIR) -> str:
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9._-]", "_", model) + ".npz")
+
+_projections = {}
+
+def get_projection(model: str, directory=PROJECTION_DIR) -> Projection:
+    """Registered projection for a model (loaded once); raises when it has not been fitted"""
+    if model not in _projections:
+        path = projection_path(model, directory)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No projection for {model} at {path}; run projection.py --fit first")
+        _projections[model] = Projection.load(path)
+    return _projections[model]
+
+def project(model: str, vectors: List[List[float]]) -> List[List[float]]:
+    """Map a model's embeddings into the shared space; unchanged when projection is disabled"""
+    if not PROJECTION_ENABLED or not len(vectors):
+        return vectors
+    return get_projection(model).apply(vectors).tolist()
+
+def project_one(model: str, vector: List[float]) -> List[float]:
+    return project(model, [vector])[0]
+
+def index_dimension(default: int) -> int:
+    """Dimension vectors are stored at: the shared space when projecting, else the model's own"""
+    return SHARED_DIM if PROJECTION_ENABLED else default
+
+def embedding_space(model: str) -> str:
+    """Identifier of the space a model's stored vectors live in (changes when the projection is refitted)"""
+    if not PROJECTION_ENABLED:
+        return model
+    return f"{model}@shared{SHARED_DIM}-{get_projection(model).digest()}"
+
+# -------------------- Fitting --------------------
+def fit_pca(model: str, vectors, dim: int = SHARED_DIM) -> Projection:
+    """Top principal components of the reference model's embeddings"""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    mean = vectors.mean(axis=0)
+    _, singular, components = np.linalg.svd(vectors - mean, full_matrices=False)
+    explained = (singular[:dim] ** 2).sum() / (singular ** 2).sum()
+    print(f"[INFO] PCA {model}: {vectors.shape[1]} -> {dim} dims keeps {explained:.1%} of the variance")
+    return Projection(model, mean, components[:dim].T)
+
+def fit_alignment(model: str, vectors, reference_vectors, reference: Projection) -> Projection:
+    """Ridge least-squares map from another model's embeddings onto the reference coordinates of the same texts.
+
+    Separate PCAs of two models would give unrelated axes; fitting on paired texts puts both
+    models' vectors for the same text at the same point of the shared space.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    target = reference.coordinates(reference_vectors).astype(np.float64)
+    mean = vectors.mean(axis=0)
+    centered = vectors - mean
+    gram = centered.T @ centered
+    ridge = ALIGNMENT_RIDGE * np.trace(gram) / gram.shape[0]
+    matrix = np.linalg.solve(gram + ridge * np.eye(gram.shape[0]), centered.T @ target)
+    return Projection(model, mean, matrix)
+
+def alignment_report(projection: Projection, reference: Projection, vectors, reference_vectors) -> Dict:
+    """Mean cosine to the reference point of the same text, and how often that point is the nearest one"""
+    mapped = projection.apply(vectors)
+    targets = reference.apply(reference_vectors)
+    cosine = float(np.mean(np.sum(mapped * targets, axis=1)))
+    top1 = float(np.mean(np.argmax(mapped @ targets.T, axis=1) == np.arange(len(mapped))))
+    return {"mean_cosine": cosine, "top1": top1}
+
+def sample_texts(count: int, seed: int = 0) -> List[str]:
+    """Distinct dataset row texts to fit on"""
+    from dataset_texts import iter_csv_rows
+
+    texts = sorted({text for chunk_texts, _ in iter_csv_rows() for text in chunk_texts})
+    rng = np.random.default_rng(seed)
+    return [texts[i] for i in rng.choice(len(texts), min(count, len(texts)), replace=False)]
+
+def embed_texts(model: str, texts: List[str], batch_size: int = 100) -> np.ndarray:
+    """Embeddings from the local cache, calling the model's API only for texts it lacks"""
+    import openai
+    from dotenv import load_dotenv
+    from embedding_cache import get_embedding_cache
+
+    load_dotenv()
+    cache = get_embedding_cache()
+    vectors = cache.get_many(model, texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        if model == REFERENCE_MODEL:  # served through Gemini's OpenAI-compatible endpoint, as in embedding.py
+            client = openai.OpenAI(api_key=os.getenv("GEMINI_API_KEY"), base_url="https://generativelanguage.googleapis.com/v1beta/")
+        else:
+            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        for start in range(0, len(missing), batch_size):
+            batch = [texts[i] for i in missing[start:start + batch_size]]
+            fresh = [item.embedding for item in client.embeddings.create(model=model, input=batch).data]
+            cache.put_many(model, batch, fresh)
+            for i, vector in zip(missing[start:start + batch_size], fresh):
+                vectors[i] = vector
+        print(f"[INFO] Embedded {len(missing)} texts with {model} ({len(texts) - len(missing)} cached)")
+    return np.asarray(vectors, dtype=np.float32)
+
+def fit_projections(models: List[str], count: int = 2000, dim: int = SHARED_DIM, directory: str = PROJECTION_DIR) -> Dict:
+    """Fit the reference PCA and an alignment per model on paired dataset texts, then save them all"""
+    texts = sample_texts(count)
+    split = int(len(texts) * (1 - FIT_HOLDOUT))
+    reference_vectors = embed_texts(REFERENCE_MODEL, texts)
+    reference = fit_pca(REFERENCE_MODEL, reference_vectors[:split], dim)
+    fitted = {REFERENCE_MODEL: reference}
+    for model in models:
+        if model == REFERENCE_MODEL:
+            continue
+        vectors = embed_texts(model, texts)
+        fitted[model] = fit_alignment(model, vectors[:split], reference_vectors[:split], reference)
+        report = alignment_report(fitted[model], reference, vectors[split:], reference_vectors[split:])
+        print(f"[INFO] {model} -> shared space: held-out mean cosine {report['mean_cosine']:.3f}, "
+              f"same-text top-1 {report['top1']:.1%}")
+
+    os.makedirs(directory, exist_ok=True)
+    for model, projection in fitted.items():
+        projection.save(projection_path(model, directory))
+        print(f"[OK] Saved {model} projection {projection.input_dim} -> {projection.output_dim} "
+              f"({projection.matrix.nbytes / 1024:.0f} KB) to {projection_path(model, directory)}")
+    return fitted
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fit per-model projections into the shared embedding space")
+    parser.add_argument("--fit", action="store_true", help="Embed sample texts (cache first) and fit every projection")
+    parser.add_argument("--models", nargs="+", default=list(SUPPORTED_MODELS))
+    parser.add_argument("--sample", type=int, default=2000, help="Dataset texts to fit on")
+    parser.add_argument("--dim", type=int, default=SHARED_DIM)
+    parser.add_argument("--directory", default=PROJECTION_DIR)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.fit:
+        fit_projections(args.models, args.sample, args.dim, args.directory)
+    for name in SUPPORTED_MODELS:
+        path = projection_path(name, args.directory)
+        status = "missing"
+        if os.path.exists(path):
+            loaded = Projection.load(path)
+            status = f"{loaded.input_dim} -> {loaded.output_dim}"
+        print(f"[INFO] {name}: {status}")
@@ -0,0 +1,100 @@
+import functools
+import os
+import time
+from typing import Dict, List
+from hybrid_search import tokenize, tokenize_document
+
+# -------------------- Configuration --------------------
+RERANK_ENABLED = os.getenv("RERANK", "1") != "0"  # RERANK=0 keeps plain fused order for A/B comparison
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "4"))  # candidates fetched per final result
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "1.0"))
+MMR_LAMBDA = 0.7  # relevance vs. diversity trade-off in maximal marginal relevance
+
+# Relevance = weighted sum of the fused rank score and the local features below
+RERANK_WEIGHTS = {"fused": 0.4, "overlap": 0.3, "disease": 0.2, "prior": 0.1}
+
+# How useful a row from each file usually is as an answer (Training.csv rows are long 0/1 symptom flags)
+SOURCE_PRIORS = {
+    "description.csv": 1.0,
+    "medications.csv": 0.9,
+    "precautions_df.csv": 0.9,
+    "diets.csv": 0.8,
+    "workout_df.csv": 0.7,
+    "symptoms_df.csv": 0.7,
+    "Symptom-severity.csv": 0.5,
+    "Training.csv": 0.3,
+    "Doctors_in_Pakistancsv.csv": 0.6,
+}
+DEFAULT_SOURCE_PRIOR = 0.5
+
+rerank_stats = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "over_budget": 0}
+
+# -------------------- Features --------------------
+@functools.lru_cache(maxsize=8192)
+def _text_tokens(text: str) -> frozenset:
+    """Token set of a row text; rows repeat across queries so this is memoized"""
+    return frozenset(tokenize_document(text))
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+def relevance_features(query_tokens: frozenset, query_text: str, match: Dict) -> Dict[str, float]:
+    """Cheap CPU features for one fused match"""
+    metadata = match["metadata"]
+    tokens = _text_tokens(metadata.get("text", ""))
+    disease = str(metadata.get("disease") or "").lower()
+    return {
+        "overlap": len(query_tokens & tokens) / len(query_tokens) if query_tokens else 0.0,
+        "disease": 1.0 if disease and disease in query_text else 0.0,
+        "prior": SOURCE_PRIORS.get(metadata.get("source_file"), DEFAULT_SOURCE_PRIOR),
+    }
+
+# -------------------- Re-ranking --------------------
+def rerank(query: str, matches: List[Dict], top_k: int, warn: bool = True) -> List[Dict]:
+    """Re-score fused candidates locally and pick a diversified top-k with MMR.
+
+    matches are in fused order; each returned match gets a "rerank" entry in its scores.
+    warn=False still counts over-budget calls in rerank_stats but does not print them (benchmarks).
+    """
+    started = time.perf_counter()
+    if not matches:
+        return []
+    query_text = query.lower()
+    query_tokens = frozenset(tokenize(query))
+    best_fused = matches[0]["score"] or 1.0
+
+    relevance, token_sets = [], []
+    for match in matches:
+        features = relevance_features(query_tokens, query_text, match)
+        features["fused"] = match["score"] / best_fused
+        relevance.append(sum(RERANK_WEIGHTS[name] * value for name, value in features.items()))
+        token_sets.append(_text_tokens(match["metadata"].get("text", "")))
+
+    # Maximal marginal relevance: penalise candidates that repeat an already chosen row.
+    # redundancy[i] is kept as the max similarity to the selection so far (one Jaccard per pick).
+    selected, remaining = [], list(range(len(matches)))
+    redundancy = [0.0] * len(matches)
+    while remaining and len(selected) < top_k:
+        best = max(remaining, key=lambda i: MMR_LAMBDA * relevance[i] - (1 - MMR_LAMBDA) * redundancy[i])
+        selected.append(best)
+        remaining.remove(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _jaccard(token_sets[i], token_sets[best]))
+
+    reranked = []
+    for i in selected:
+        match = dict(matches[i], scores=dict(matches[i]["scores"], rerank=round(relevance[i], 4)))
+        reranked.append(match)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rerank_stats["calls"] += 1
+    rerank_stats["total_ms"] += elapsed_ms
+    rerank_stats["max_ms"] = max(rerank_stats["max_ms"], elapsed_ms)
+    if elapsed_ms > RERANK_BUDGET_MS:
+        rerank_stats["over_budget"] += 1
+        if warn:
+            print(f"[WARNING] Re-ranking {len(matches)} candidates took {elapsed_ms:.2f}ms (budget {RERANK_BUDGET_MS}ms)")
+    return reranked
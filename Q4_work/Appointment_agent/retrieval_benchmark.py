@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from dataset_texts import DATASETS_DIR
+from hybrid_search import load_bm25_index, reciprocal_rank_fusion
+from namespaces import namespaces_for_query
+from projection import PROJECTION_ENABLED, REFERENCE_MODEL, embed_texts, project
+from reranker import RERANK_OVERFETCH, rerank, rerank_stats
+from vector_store import VECTOR_STORE_BACKEND, VECTOR_STORE_BACKENDS, get_vector_store, query_namespaces
+
+# -------------------- Configuration --------------------
+BENCHMARK_FIXTURE_DIR = "benchmark_fixtures"
+# The model main.py queries with once the index is in the shared space; without the projection
+# a 1536-d text-embedding-3-small query cannot search the 768-d index, so use the index's own model
+BENCHMARK_MODEL = os.getenv("BENCHMARK_EMBEDDING_MODEL", "text-embedding-3-small" if PROJECTION_ENABLED else REFERENCE_MODEL)
+RECALL_KS = (1, 3, 5, 10)
+QUERIES_PER_DISEASE = 5  # symptom-set queries sampled per disease from symptoms_df.csv
+RETRIEVERS = ("vector", "bm25", "hybrid")
+# Regression gate tolerances used with --baseline
+MAX_RECALL_DROP = 0.02
+MAX_P95_GROWTH = 1.25
+PROGNOSIS_RE = re.compile(r"prognosis: ([^|]+)")
+
+# -------------------- Labelled Queries --------------------
+def normalize_disease(name) -> str:
+    return " ".join(str(name).lower().split())
+
+def build_labelled_queries(datasets_dir=DATASETS_DIR, per_disease=QUERIES_PER_DISEASE, seed=0) -> List[Dict]:
+    """(query, expected disease) pairs: patient-style symptom lists and name-masked descriptions"""
+    rng = np.random.default_rng(seed)
+    labelled = []
+
+    symptoms_df = pd.read_csv(os.path.join(datasets_dir, "symptoms_df.csv"))
+    symptom_cols = [col for col in symptoms_df.columns if col.startswith("Symptom")]
+    for disease, rows in symptoms_df.groupby("Disease", sort=True):
+        phrasings = set()
+        for _, row in rows.iterrows():
+            symptoms = [str(row[col]).strip().replace("_", " ") for col in symptom_cols
+                        if pd.notna(row[col]) and str(row[col]).strip()]
+            if symptoms:
+                phrasings.add("I have " + ", ".join(" ".join(s.split()) for s in symptoms))
+        phrasings = sorted(phrasings)
+        for i in rng.permutation(len(phrasings))[:per_disease]:
+            labelled.append({"query": phrasings[i], "expected": normalize_disease(disease), "kind": "symptoms"})
+
+    description_df = pd.read_csv(os.path.join(datasets_dir, "description.csv"))
+    for _, row in description_df.iterrows():
+        masked = re.sub(re.escape(str(row["Disease"]).strip()), "this condition", str(row["Description"]), flags=re.I)
+        first_sentence = masked.split(". ")[0].strip().rstrip(".")
+        labelled.append({"query": f"What is it when {first_sentence}?", "expected": normalize_disease(row["Disease"]),
+                         "kind": "description"})
+    return labelled
+
+def match_disease(match: Dict) -> str:
+    """Disease a retrieved row is about (Training.csv rows carry it as 'prognosis')"""
+    metadata = match.get("metadata") or {}
+    if metadata.get("disease"):
+        return normalize_disease(metadata["disease"])
+    found = PROGNOSIS_RE.search(metadata.get("text", ""))
+    return normalize_disease(found.group(1)) if found else ""
+
+# -------------------- Fixtures --------------------
+def fixture_path(model=BENCHMARK_MODEL, fixture_dir=BENCHMARK_FIXTURE_DIR) -> str:
+    return os.path.join(fixture_dir, re.sub(r"[^A-Za-z0-9._-]", "_", model) + ".npz")
+
+def build_fixtures(model=BENCHMARK_MODEL, fixture_dir=BENCHMARK_FIXTURE_DIR) -> str:
+    """Embed the labelled queries once (embedding cache first, then the model's API) and save them for offline runs"""
+    labelled = build_labelled_queries()
+    texts = [item["query"] for item in labelled]
+    vectors = embed_texts(model, texts)
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    path = fixture_path(model, fixture_dir)
+    np.savez_compressed(path, queries=np.array(texts), expected=np.array([item["expected"] for item in labelled]),
+                        kinds=np.array([item["kind"] for item in labelled]), vectors=vectors)
+    print(f"[OK] Saved {len(texts)} fixture embeddings to {path}")
+    return path
+
+def load_fixtures(path: str):
+    """Labelled queries and their precomputed embeddings"""
+    data = np.load(path)
+    labelled = [{"query": str(q), "expected": str(e), "kind": str(k)}
+                for q, e, k in zip(data["queries"], data["expected"], data["kinds"])]
+    return labelled, data["vectors"]
+
+# -------------------- Evaluation --------------------
+def evaluate(labelled: List[Dict], search, ks=RECALL_KS) -> Dict:
+    """recall@k, MRR and latency percentiles of search(i, query, top_k) -> ranked matches"""
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for i, item in enumerate(labelled):
+        started = time.perf_counter()
+        matches = search(i, item["query"], max_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rank = next((r for r, match in enumerate(matches[:max_k], 1) if match_disease(match) == item["expected"]), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in ks:
+            hits[k] += bool(rank and rank <= k)
+
+    latencies = np.array(latencies)
+    result = {"queries": len(labelled), "mrr": round(float(np.mean(reciprocal_ranks)), 4)}
+    for k in ks:
+        result[f"recall@{k}"] = round(hits[k] / len(labelled), 4)
+    for q in (50, 95, 99):
+        result[f"p{q}_ms"] = round(float(np.percentile(latencies, q)), 3)
+    return result
+
+def make_searchers(store, bm25_index, vectors, use_rerank=True) -> Dict:
+    """Retriever name -> search(i, query, top_k), mirroring main.retrieve_medical_information"""
+    def vector_search(i, query, top_k):
+        return query_namespaces(store, vectors[i], namespaces_for_query(query), top_k=top_k)["matches"]
+
+    def bm25_search(i, query, top_k):
+        return bm25_index.search(query, top_k, namespaces_for_query(query))
+
+    def hybrid_search(i, query, top_k):
+        candidates = top_k * RERANK_OVERFETCH if use_rerank else top_k
+        result_lists = {}
+        if store is not None:
+            result_lists["vector"] = vector_search(i, query, candidates)
+        if bm25_index is not None:
+            result_lists["bm25"] = bm25_search(i, query, candidates)
+        fused = reciprocal_rank_fusion(result_lists, candidates)
+        return rerank(query, fused, top_k, warn=False) if use_rerank else fused[:top_k]
+
+    searchers = {"hybrid": hybrid_search}
+    if store is not None:
+        searchers["vector"] = vector_search
+    if bm25_index is not None:
+        searchers["bm25"] = bm25_search
+    return searchers
+
+def compare_to_baseline(results: Dict, baseline: Dict) -> List[str]:
+    """Regressions of results against a saved run: recall drops and p95 growth beyond tolerance"""
+    failures = []
+    for retriever, metrics in results.items():
+        previous = baseline.get(retriever)
+        if not previous:
+            continue
+        for name, value in metrics.items():
+            if (name.startswith("recall@") or name == "mrr") and name in previous and value < previous[name] - MAX_RECALL_DROP:
+                failures.append(f"{retriever} {name}: {value} < baseline {previous[name]}")
+        if metrics["p95_ms"] > previous["p95_ms"] * MAX_P95_GROWTH:
+            failures.append(f"{retriever} p95_ms: {metrics['p95_ms']} > baseline {previous['p95_ms']} x {MAX_P95_GROWTH}")
+    return failures
+
+def print_results(results: Dict):
+    for retriever, metrics in results.items():
+        recalls = " ".join(f"R@{name.split('@')[1]}={value:.3f}" for name, value in metrics.items() if name.startswith("recall@"))
+        print(f"[INFO] {retriever:<7} n={metrics['queries']} {recalls} MRR={metrics['mrr']:.3f} "
+              f"p50={metrics['p50_ms']}ms p95={metrics['p95_ms']}ms p99={metrics['p99_ms']}ms")
+
+def run_benchmark(backend=VECTOR_STORE_BACKEND, retrievers=RETRIEVERS, model=BENCHMARK_MODEL,
+                  fixture_dir=BENCHMARK_FIXTURE_DIR, use_rerank=True) -> Dict:
+    """Evaluate each available retriever on the labelled queries (no embedding calls)"""
+    path = fixture_path(model, fixture_dir)
+    store, vectors = None, None
+    if os.path.exists(path):
+        labelled, vectors = load_fixtures(path)
+        vectors = np.asarray(project(model, vectors), dtype=np.float32)  # same path as main.embed_queries
+        store = get_vector_store(backend)
+        dimension = store.dimension()
+        if dimension and dimension != vectors.shape[1]:
+            raise ValueError(f"{model} fixtures are {vectors.shape[1]}-d but the {backend} index is {dimension}-d; "
+                             f"rebuild them with --build-fixtures --model {REFERENCE_MODEL}, or enable EMBED_PROJECTION "
+                             f"with a fitted projection and an index built from projected vectors")
+    else:
+        print(f"[WARNING] No fixture embeddings at {path}; run with --build-fixtures once. Benchmarking BM25 only")
+        labelled = build_labelled_queries()
+    bm25_index = load_bm25_index()
+
+    searchers = make_searchers(store, bm25_index, vectors, use_rerank)
+    results = {}
+    for retriever in retrievers:
+        if retriever in searchers:
+            over_budget = rerank_stats["over_budget"]
+            results[retriever] = evaluate(labelled, searchers[retriever])
+            if rerank_stats["over_budget"] > over_budget:
+                print(f"[WARNING] {retriever}: {rerank_stats['over_budget'] - over_budget}/{len(labelled)} re-rankings "
+                      f"over budget at {max(RECALL_KS) * RERANK_OVERFETCH} candidates")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark")
+    parser.add_argument("--backend", choices=VECTOR_STORE_BACKENDS, default=VECTOR_STORE_BACKEND)
+    parser.add_argument("--retrievers", nargs="+", choices=RETRIEVERS, default=list(RETRIEVERS))
+    parser.add_argument("--model", default=BENCHMARK_MODEL)
+    parser.add_argument("--fixture-dir", default=BENCHMARK_FIXTURE_DIR)
+    parser.add_argument("--no-rerank", action="store_true", help="Hybrid retriever without the local re-ranker")
+    parser.add_argument("--build-fixtures", action="store_true", help="Embed the labelled queries (needs network)")
+    parser.add_argument("--output", help="Write results as JSON (usable as a later --baseline)")
+    parser.add_argument("--baseline", help="Fail with exit code 1 if results regress against this JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.build_fixtures:
+        build_fixtures(args.model, args.fixture_dir)
+    try:
+        results = run_benchmark(args.backend, args.retrievers, args.model, args.fixture_dir, not args.no_rerank)
+    except (ValueError, FileNotFoundError) as e:  # fixture / index dimensions disagree, or projection not fitted
+        print(f"[ERROR] {e}")
+        sys.exit(2)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare_to_baseline(results, json.load(f))
+        for failure in failures:
+            print(f"[ERROR] Regression: {failure}")
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,169 @@
+import functools
+import os
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from dataset_texts import DATASETS_DIR
+
+# -------------------- Configuration --------------------
+SEVERITY_FILE = "Symptom-severity.csv"
+FUZZY_THRESHOLD = float(os.getenv("SYMPTOM_FUZZY_THRESHOLD", "0.65"))  # Dice similarity of character n-grams
+MAX_SPAN_WORDS = 4  # longest run of words compared against the vocabulary
+MIN_SPAN_CHARS = 4  # shorter leftovers ("a", "in") are never fuzzy-matched
+
+# Lay terms for symptom columns whose names patients rarely use verbatim
+SYMPTOM_SYNONYMS = {
+    "fever": ["high_fever", "mild_fever"],
+    "temperature": ["high_fever", "mild_fever"],
+    "rash": ["skin_rash"],
+    "itchy": ["itching"],
+    "tired": ["fatigue"],
+    "tiredness": ["fatigue"],
+    "throwing up": ["vomiting"],
+    "vomit": ["vomiting"],
+    "short of breath": ["breathlessness"],
+    "shortness of breath": ["breathlessness"],
+    "difficulty breathing": ["breathlessness"],
+    "dizzy": ["dizziness"],
+    "stomach ache": ["stomach_pain"],
+    "belly pain": ["abdominal_pain"],
+    "sneezing": ["continuous_sneezing"],
+    "runny nose": ["runny_nose"],
+    "yellow skin": ["yellowish_skin"],
+    "yellow eyes": ["yellowing_of_eyes"],
+    "loose motions": ["diarrhoea"],
+    "diarrhea": ["diarrhoea"],
+    "joint ache": ["joint_pain"],
+    "blurred vision": ["blurred_and_distorted_vision"],
+}
+
+# Words a fuzzy span never starts or ends with: close to symptom names but saying nothing
+STOPWORDS = {
+    "i", "im", "i'm", "ive", "i've", "have", "has", "had", "having", "and", "or", "the", "a", "an", "my", "me",
+    "with", "since", "for", "from", "about", "what", "is", "are", "was", "been", "of", "in", "on", "at", "to",
+    "some", "very", "really", "also", "days", "day", "week", "weeks", "feel", "feeling", "getting", "got",
+    "severe", "mild", "slight", "little", "bit", "lot", "after", "before", "when", "this", "that",
+}
+GENERIC_WORDS = {"pain", "ache", "aches", "problem", "issue"}  # part of a symptom name, never one on their own
+WORD_RE = re.compile(r"[a-z][a-z']*")
+
+def symptom_phrase(column: str) -> str:
+    """'spotting_ urination' -> 'spotting urination'"""
+    return " ".join(column.replace("_", " ").split())
+
+def symptom_key(name: str) -> str:
+    """Spacing-insensitive id: Symptom-severity.csv writes 'foul_smell_of urine', Training.csv has 'fluid_overload.1'"""
+    return re.sub(r"\.\d+$", "", re.sub(r"[\s_]+", "", str(name).lower()))
+
+@functools.lru_cache(maxsize=4)
+def severity_names(datasets_dir=DATASETS_DIR) -> Tuple[str, ...]:
+    path = os.path.join(datasets_dir, SEVERITY_FILE)
+    return tuple(pd.read_csv(path)["Symptom"].astype(str)) if os.path.exists(path) else ()
+
+def build_aliases(columns: List[str], extra_names: List[str] = ()) -> Dict[str, List[str]]:
+    """phrase -> symptom columns: each column's own name, the same symptom as spelled in
+    Symptom-severity.csv, and SYMPTOM_SYNONYMS"""
+    by_key = {symptom_key(column): column for column in columns}
+    aliases = {symptom_phrase(column): [column] for column in columns}
+    for name in extra_names:
+        column = by_key.get(symptom_key(name))
+        if column and symptom_phrase(name) not in aliases:
+            aliases[symptom_phrase(name)] = [column]
+    for phrase, synonym_columns in SYMPTOM_SYNONYMS.items():
+        known = [column for column in synonym_columns if column in by_key.values()]
+        if known and phrase not in aliases:
+            aliases[phrase] = known
+    return aliases
+
+def char_ngrams(text: str) -> List[str]:
+    """Distinct character bigrams and trigrams of the space-padded text (bigrams keep short words typo tolerant)"""
+    padded = f" {text} "
+    return list(dict.fromkeys([padded[i:i + 2] for i in range(len(padded) - 1)] +
+                              [padded[i:i + 3] for i in range(len(padded) - 2)]))
+
+# -------------------- Index --------------------
+class SymptomIndex:
+    """Maps free text to symptom columns, tolerating typos and plurals.
+
+    Exact phrases are found first with one compiled regex. Runs of up to MAX_SPAN_WORDS leftover
+    words are then compared with every phrase at once: both sides are 0/1 character n-gram
+    vectors, so a single (spans x grams) @ (grams x phrases) product gives the overlaps for a
+    Dice similarity.
+    """
+
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self.aliases = aliases
+        self.phrases = sorted(aliases, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(?:" + "|".join(r"\s+".join(map(re.escape, p.split())) for p in self.phrases) + r")\b")
+
+        self.grams = {}
+        phrase_grams = [char_ngrams(phrase) for phrase in self.phrases]
+        for grams in phrase_grams:
+            for gram in grams:
+                self.grams.setdefault(gram, len(self.grams))
+        self.matrix = np.zeros((len(self.grams), len(self.phrases)), dtype=np.float32)  # (grams, phrases)
+        for j, grams in enumerate(phrase_grams):
+            self.matrix[[self.grams[gram] for gram in grams], j] = 1.0
+        self.sizes = self.matrix.sum(axis=0)
+        self.word_counts = np.array([len(phrase.split()) for phrase in self.phrases])
+
+    def _exact(self, text: str) -> List[Tuple[int, int, str, float]]:
+        return [(hit.start(), hit.end(), " ".join(hit.group(0).split()), 1.0) for hit in self.pattern.finditer(text)]
+
+    def _fuzzy(self, text: str, taken: List[Tuple[int, int]]) -> List[Tuple[int, int, str, float]]:
+        words = [w for w in WORD_RE.finditer(text) if not any(start <= w.start() < end for start, end in taken)]
+        spans = []
+        for i in range(len(words)):
+            for j in range(i, min(i + MAX_SPAN_WORDS, len(words))):
+                if j > i and words[j].start() - words[j - 1].end() > 2:  # only runs of adjacent words
+                    break
+                chunk = [w.group(0) for w in words[i:j + 1]]
+                if chunk[0] in STOPWORDS or chunk[-1] in STOPWORDS or (len(chunk) == 1 and chunk[0] in GENERIC_WORDS):
+                    continue
+                span_text = " ".join(chunk)
+                if len(span_text) >= MIN_SPAN_CHARS:
+                    spans.append((words[i].start(), words[j].end(), span_text, j - i + 1))
+        if not spans:
+            return []
+
+        vectors = np.zeros((len(spans), len(self.grams)), dtype=np.float32)
+        sizes = np.zeros(len(spans), dtype=np.float32)
+        for row, (_, _, span_text, _) in enumerate(spans):
+            grams = char_ngrams(span_text)
+            sizes[row] = len(grams)
+            vectors[row, [self.grams[gram] for gram in grams if gram in self.grams]] = 1.0
+        dice = 2 * (vectors @ self.matrix) / (sizes[:, None] + self.sizes[None, :])
+        # A span must have at least as many words as the phrase: "skin" alone is not "skin rash"
+        dice *= np.array([count for *_, count in spans])[:, None] >= self.word_counts[None, :]
+        best = dice.argmax(axis=1)
+        scores = dice[np.arange(len(spans)), best]
+        return [(start, end, self.phrases[best[row]], float(scores[row]))
+                for row, (start, end, _, _) in enumerate(spans) if scores[row] >= FUZZY_THRESHOLD]
+
+    def lookup(self, text: str) -> List[Dict]:
+        """Symptom mentions in text, in order: {"text", "phrase", "symptoms", "score"} (score 1.0 when exact)"""
+        text = text.lower()
+        exact = self._exact(text)
+        fuzzy = self._fuzzy(text, [(start, end) for start, end, _, _ in exact])
+        # Best-scoring, then longest, non-overlapping spans win
+        chosen = []
+        for start, end, phrase, score in sorted(exact + fuzzy, key=lambda hit: (-hit[3], -(hit[1] - hit[0]))):
+            if all(end <= other_start or start >= other_end for other_start, other_end, _, _ in chosen):
+                chosen.append((start, end, phrase, score))
+        return [{"text": text[start:end], "phrase": phrase, "symptoms": self.aliases[phrase], "score": round(score, 3)}
+                for start, end, phrase, score in sorted(chosen)]
+
+    def symptom_ids(self, text: str) -> List[str]:
+        """Canonical symptom columns mentioned in text, in order of appearance"""
+        found = []
+        for hit in self.lookup(text):
+            for column in hit["symptoms"]:
+                if column not in found:
+                    found.append(column)
+        return found
+
+    def expand_query(self, text: str) -> str:
+        """Text plus the canonical names of symptoms it only mentions misspelled, for retrieval"""
+        corrected = [hit["phrase"] for hit in self.lookup(text) if hit["score"] < 1.0]
+        return f"{text} ({', '.join(dict.fromkeys(corrected))})" if corrected else text
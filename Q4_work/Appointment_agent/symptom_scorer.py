@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import os
+import time
+from typing import Dict, List
+import numpy as np
+from dataset_texts import DATASETS_DIR
+from symptom_index import SymptomIndex, build_aliases, severity_names, symptom_phrase
+
+# -------------------- Configuration --------------------
+TRAINING_FILE = "Training.csv"
+SCORER_CACHE_DIR = "cache"
+SMOOTHING = 1.0  # Laplace smoothing of P(symptom | disease)
+COVERAGE_WEIGHT = 2.0  # bonus for explaining more of a disease's typical symptoms (breaks subset ties)
+VAGUE_MAX_CONFIDENCE = 0.5  # --check: a lone vague symptom must not name any disease with more confidence
+VAGUE_CHECKS = ["fever", "I have fever", "temperature", "I have a temperature"]
+
+# Specialty that treats each disease, for the doctors main.py can recommend
+DISEASE_SPECIALTY = {
+    "Heart attack": "Cardiologist",
+    "Hypertension": "Cardiologist",
+    "Varicose veins": "Cardiologist",
+    "Migraine": "Neurologist",
+    "Paralysis (brain hemorrhage)": "Neurologist",
+    "(vertigo) Paroymsal Positional Vertigo": "Neurologist",
+    "Cervical spondylosis": "Neurologist",
+    "Fungal infection": "Dermatologist",
+    "Acne": "Dermatologist",
+    "Psoriasis": "Dermatologist",
+    "Impetigo": "Dermatologist",
+}
+
+def normalize_disease(name: str) -> str:
+    return " ".join(str(name).split())
+
+# -------------------- Scorer --------------------
+class SymptomScorer:
+    """Ranks all diseases for a set of symptoms with one matrix multiply.
+
+    Training.csv (4,920 cases x 132 binary symptoms) is reduced to two per-disease profiles
+    stacked in one (2 * diseases, symptoms) float32 matrix: smoothed log P(symptom | disease)
+    and the disease's symptom frequencies divided by its profile size. A symptom vector x gives
+    both log-likelihood and coverage in a single matrix @ x; the combined score is softmaxed
+    into a confidence.
+    """
+
+    def __init__(self, symptoms: List[str], diseases: List[str], profiles, case_count: int):
+        self.symptoms = symptoms  # column names, in vector order
+        self.diseases = diseases
+        self.profiles = np.asarray(profiles, dtype=np.float32)  # (2 * diseases, symptoms)
+        self.case_count = case_count
+        self.index = {name: i for i, name in enumerate(symptoms)}
+        # Names, Symptom-severity.csv spellings and synonyms, matched exactly or despite typos
+        self.symptom_index = SymptomIndex(build_aliases(symptoms, severity_names()))
+
+    @classmethod
+    def from_training(cls, path: str) -> "SymptomScorer":
+        import pandas as pd
+
+        frame = pd.read_csv(path)
+        frame = frame.loc[:, ~frame.columns.str.startswith("Unnamed")]
+        symptoms = [column for column in frame.columns if column != "prognosis"]
+        labels = frame["prognosis"].map(normalize_disease)
+        diseases = sorted(labels.unique())
+        matrix = frame[symptoms].to_numpy(dtype=np.float32)
+
+        onehot = (labels.to_numpy()[:, None] == np.array(diseases)[None, :]).astype(np.float32)
+        counts = onehot.T @ matrix  # (diseases, symptoms) cases with each symptom
+        cases = onehot.sum(axis=0)[:, None]
+        log_likelihood = np.log((counts + SMOOTHING) / (cases + 2 * SMOOTHING))
+        frequency = counts / cases
+        coverage = frequency / np.maximum(frequency.sum(axis=1, keepdims=True), 1e-6)
+        return cls(symptoms, diseases, np.vstack([log_likelihood, coverage]), len(frame))
+
+    def parse(self, text: str) -> List[str]:
+        """Symptom columns mentioned in free text, in order of appearance"""
+        return self.symptom_index.symptom_ids(text)
+
+    def parse_groups(self, text: str) -> List[List[str]]:
+        """One entry per symptom mentioned: its column, or every column a vague term ("fever") may mean.
+
+        A vague term is dropped when one of its readings is also named outright ("fever, high fever").
+        """
+        groups = []
+        for hit in self.symptom_index.lookup(text):
+            if hit["symptoms"] not in groups:
+                groups.append(hit["symptoms"])
+        named = {group[0] for group in groups if len(group) == 1}
+        return [group for group in groups if len(group) == 1 or not named.intersection(group)]
+
+    def vector(self, columns: List[str]) -> np.ndarray:
+        x = np.zeros(len(self.symptoms), dtype=np.float32)
+        x[[self.index[column] for column in columns]] = 1.0
+        return x
+
+    def score_vectors(self, vectors) -> np.ndarray:
+        """(n, symptoms) 0/1 rows -> (n, diseases) confidences; one matmul for the whole batch"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return self._confidence(vectors @ self.profiles.T)
+
+    def score_groups(self, groups: List[List[str]]) -> np.ndarray:
+        """(diseases,) confidences for parse_groups output.
+
+        Plain symptoms go through the matmul; a vague term is one observation, scored per disease
+        as its best-matching reading, so "fever" cannot count as both high and mild fever.
+        """
+        raw = self.profiles @ self.vector([group[0] for group in groups if len(group) == 1])
+        for group in groups:
+            if len(group) > 1:
+                raw += self.profiles[:, [self.index[column] for column in group]].max(axis=1)
+        return self._confidence(raw[None, :])[0]
+
+    def _confidence(self, raw) -> np.ndarray:
+        """(n, 2 * diseases) log-likelihood and coverage sums -> (n, diseases) softmax confidences"""
+        n = len(self.diseases)
+        scores = raw[:, :n] + COVERAGE_WEIGHT * raw[:, n:]
+        scores -= scores.max(axis=1, keepdims=True)
+        weights = np.exp(scores)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def rank(self, text: str, top_k: int = 3) -> List[Dict]:
+        """Top-k conditions for free-text symptoms, with confidence and the symptoms that matched"""
+        groups = self.parse_groups(text)
+        if not groups:
+            return []
+        confidence = self.score_groups(groups)
+        top = np.argpartition(-confidence, min(top_k, len(confidence)) - 1)[:top_k]
+        top = top[np.argsort(-confidence[top])]
+        n = len(self.diseases)
+        return [{
+            "disease": self.diseases[i],
+            "confidence": float(confidence[i]),
+            "matched": [symptom_phrase(found[0]) for group in groups
+                        for found in [[c for c in group if self.profiles[n + i, self.index[c]] > 0]] if found],
+            "specialty": DISEASE_SPECIALTY.get(self.diseases[i]),
+        } for i in top]
+
+    def save(self, path):
+        np.savez(path, symptoms=np.array(self.symptoms), diseases=np.array(self.diseases),
+                 profiles=self.profiles, case_count=self.case_count)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["symptoms"].tolist(), saved["diseases"].tolist(), saved["profiles"], int(saved["case_count"]))
+
+def load_symptom_scorer(datasets_dir=DATASETS_DIR, cache_dir=SCORER_CACHE_DIR) -> SymptomScorer:
+    """Load the precomputed profiles for the current Training.csv, building and caching them when missing"""
+    path = os.path.join(datasets_dir, TRAINING_FILE)
+    stat = os.stat(path)
+    key = hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}:{SMOOTHING}".encode()).hexdigest()
+    cache_file = os.path.join(cache_dir, f"symptom_profiles_{key}.npz")
+    if os.path.exists(cache_file):
+        return SymptomScorer.load(cache_file)
+
+    started = time.perf_counter()
+    scorer = SymptomScorer.from_training(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    scorer.save(cache_file + ".tmp.npz")
+    os.replace(cache_file + ".tmp.npz", cache_file)
+    print(f"[OK] Built symptom profiles for {len(scorer.diseases)} diseases in {time.perf_counter() - started:.2f}s")
+    return scorer
+
+# -------------------- Checks --------------------
+def sample_accuracy(scorer: SymptomScorer, path: str, per_case: int = 3, seed: int = 0) -> Dict:
+    """Top-1 / top-3 accuracy when each Training.csv case is reduced to per_case of its symptoms"""
+    import pandas as pd
+
+    frame = pd.read_csv(path)
+    rng = np.random.default_rng(seed)
+    labels = frame["prognosis"].map(normalize_disease).to_numpy()
+    matrix = frame[scorer.symptoms].to_numpy(dtype=np.float32)
+    vectors = np.zeros_like(matrix)
+    for row, present in enumerate(matrix):
+        columns = np.flatnonzero(present)
+        vectors[row, rng.choice(columns, min(per_case, len(columns)), replace=False)] = 1.0
+    confidence = scorer.score_vectors(vectors)
+    top3 = np.argsort(-confidence, axis=1)[:, :3]
+    expected = np.array([scorer.diseases.index(label) for label in labels])
+    return {"top1": float(np.mean(top3[:, 0] == expected)), "top3": float(np.mean((top3 == expected[:, None]).any(axis=1)))}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the local symptom scorer")
+    parser.add_argument("--per-case", type=int, default=3, help="Symptoms kept per Training.csv case")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    scorer = load_symptom_scorer()
+    accuracy = sample_accuracy(scorer, os.path.join(DATASETS_DIR, TRAINING_FILE), args.per_case)
+    print(f"[INFO] {args.per_case} symptoms per case: top-1 {accuracy['top1']:.1%}, top-3 {accuracy['top3']:.1%}")
+    failures = 0
+    for text in VAGUE_CHECKS:
+        ranked = scorer.rank(text, top_k=1)
+        if ranked and ranked[0]["confidence"] > VAGUE_MAX_CONFIDENCE:
+            failures += 1
+            print(f"[ERROR] '{text}' is too confident: {ranked[0]['disease']} {ranked[0]['confidence']:.0%}")
+    if not failures:
+        print(f"[OK] No lone vague symptom ranks a disease above {VAGUE_MAX_CONFIDENCE:.0%}")
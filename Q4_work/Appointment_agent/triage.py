@@ -0,0 +1,232 @@
+import argparse
+import os
+import re
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from keyword_matcher import match_keywords
+from dataset_texts import DATASETS_DIR
+from symptom_index import symptom_key, symptom_phrase
+from symptom_scorer import SymptomScorer, load_symptom_scorer
+
+# -------------------- Configuration --------------------
+SEVERITY_FILE = "Symptom-severity.csv"
+URGENCY_TIERS = ["low", "medium", "high", "emergency"]
+# Thresholds on the summed severity weights (1-7 each) of the symptoms named in one message.
+# The sum grows with how many symptoms are listed, not how severe they are, so it tops out at high.
+MEDIUM_SCORE = int(os.getenv("TRIAGE_MEDIUM_SCORE", "5"))
+HIGH_SCORE = int(os.getenv("TRIAGE_HIGH_SCORE", "15"))
+TRIAGE_FAST_PATH = os.getenv("TRIAGE_FAST_PATH", "1") != "0"  # answer emergency-tier messages without the model
+HIGH_PEAK = 7  # a single maximum-weight symptom (high fever, chest pain, coma...) is at least high
+# --check: reported symptoms that must stay emergency, and questions that must not become one
+EMERGENCY_CHECKS = ["I have difficulty breathing", "severe pain", "emergency", "heart attack",
+                    "my friend is unconscious", "stroke symptoms in my mother right now", "chest pain"]
+QUESTION_CHECKS = ["What is a coma?", "is coma dangerous", "Tell me about chest pain causes", "chest pain exercise",
+                   "How can I prevent a stroke?"]
+
+# Symptoms that need emergency care on their own, whatever else is reported.
+# Weights alone cannot say this: a long list of mild cold symptoms outweighs chest pain.
+RED_FLAG_SYMPTOMS = [
+    "chest_pain", "coma", "stomach_bleeding", "weakness_of_one_body_side", "slurred_speech",
+    "altered_sensorium", "blood_in_sputum", "acute_liver_failure",
+]
+# An emergency keyword only means an emergency when it describes something happening now
+# ("my father is having a stroke"), not a question about it ("How can I prevent a stroke?")
+ACUTE_PATTERN = re.compile(
+    r"\b(?:having|had|just had|suffered|going into)\s+(?:a\s+|an\s+)?(?:heart attack|stroke|seizure|fit)\b"
+    r"|\b(?:i'm|i am|im|he's|he is|she's|she is|they're|they are|someone is|somebody is)\s+(?:still\s+)?"
+    r"(?:bleeding|unconscious|not breathing|choking|collapsing)\b"
+    r"|\bbleeding\s+(?:heavily|badly|a lot|profusely|non-?stop|won't stop|wont stop|will not stop)\b"
+    r"|\b(?:can't|cant|cannot|can not|unable to)\s+breathe\b|\b(?:collapsed|passed out|overdosed)\b"
+    r"|\b(?:took|taken) (?:an\s+)?overdose\b|\b(?:kill myself|suicidal|end my life)\b"
+    r"|\b(?:this is|it's|it is|having)\s+(?:an?\s+)?(?:medical\s+)?emergency\b"
+)
+# A question or topic lookup about a condition ("is coma dangerous", "chest pain exercise") that names
+# nobody it is happening to; red flags and acute events in it are capped at high
+QUESTION_PATTERN = re.compile(
+    r"^\s*(?:what|how|why|which|when|is|are|can|could|does|do|should|tell me|explain|define|can you tell)\b(?!')"
+    r"|\?\s*$"
+)
+TOPIC_PATTERN = re.compile(r"\b(?:causes?|treatments?|exercises?|workouts?|diets?|prevent(?:ion)?|symptoms of|about|meaning)\b")
+PERSON_PATTERN = re.compile(r"\b(?:i|i'm|im|my|me|we|our|he|she|his|her|they|their|someone|somebody)\b")
+# Words that move a message one tier up (never into emergency) or down (never out of emergency)
+SEVERE_PATTERN = re.compile(r"\b(?:severe|severely|worst|unbearable|extreme|intense)\b")
+MILD_PATTERN = re.compile(r"\b(?:mild|mildly|slight|slightly|minor)\b")
+REQUEST_LOG_RE = re.compile(r"\[REQUEST\] Processing: (.*?)(?:\.\.\.)?$")
+
+# -------------------- Triage --------------------
+class SeverityTriage:
+    """Urgency tiers from the severity weights of the symptoms a message names.
+
+    Weights and red flags are precomputed as one (2, symptoms) matrix aligned with the
+    scorer's symptom columns, so a batch of 0/1 symptom vectors is tiered with one matrix
+    multiply plus a row-wise max.
+    """
+
+    def __init__(self, scorer: SymptomScorer, weights: Dict[str, int]):
+        self.scorer = scorer
+        keyed = {symptom_key(name): weight for name, weight in weights.items()}
+        self.weights = np.array([keyed.get(symptom_key(column), 0) for column in scorer.symptoms], dtype=np.float32)
+        red_flags = np.zeros(len(scorer.symptoms), dtype=np.float32)
+        red_flags[[scorer.index[column] for column in RED_FLAG_SYMPTOMS if column in scorer.index]] = 1.0
+        self.matrix = np.vstack([self.weights, red_flags])  # (2, symptoms)
+
+    @classmethod
+    def from_csv(cls, scorer: SymptomScorer, datasets_dir=DATASETS_DIR) -> "SeverityTriage":
+        frame = pd.read_csv(os.path.join(datasets_dir, SEVERITY_FILE))
+        return cls(scorer, dict(zip(frame["Symptom"], frame["weight"])))
+
+    def tier_vectors(self, vectors, severe=None, mild=None, acute=None, mentioned=None, question=None) -> Dict[str, np.ndarray]:
+        """(n, symptoms) 0/1 rows -> tier index, score, peak weight and red-flag count per row.
+
+        severe/mild/acute/mentioned/question are optional per-row booleans from the message text. Only a
+        red flag or an acute event reaches emergency, and a red flag only outside a general question;
+        a mere emergency keyword (mentioned) or a red flag asked about lifts a row to high.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        n = len(vectors)
+        raw = vectors @ self.matrix.T
+        score, red_flags = raw[:, 0], raw[:, 1]
+        peak = (vectors * self.weights).max(axis=1) if vectors.shape[1] else np.zeros(n)
+
+        tier = np.select([score >= HIGH_SCORE, score >= MEDIUM_SCORE], [2, 1], 0)
+        tier = np.where(peak >= HIGH_PEAK, np.maximum(tier, 2), tier)
+        if severe is not None:
+            tier = np.where(np.asarray(severe) & (tier < 2), tier + 1, tier)
+        if mild is not None:
+            tier = np.where(np.asarray(mild) & (tier > 0), tier - 1, tier)
+        if mentioned is not None:
+            tier = np.where(np.asarray(mentioned, dtype=bool), np.maximum(tier, 2), tier)
+        urgent = red_flags > 0
+        if question is not None:
+            asked = np.asarray(question, dtype=bool)
+            tier = np.where(urgent & asked, np.maximum(tier, 2), tier)
+            urgent &= ~asked
+        if acute is not None:
+            urgent |= np.asarray(acute, dtype=bool)
+        tier = np.where(urgent, 3, tier)
+        return {"tier": tier, "score": score, "peak": peak, "red_flags": red_flags}
+
+    def parse(self, text: str):
+        """Symptom columns named in text, and the text left once they are removed.
+
+        A vague term ("fever") counts as its mildest reading.
+        """
+        found, remainder = [], text.lower()
+        for hit in self.scorer.symptom_index.lookup(text):
+            column = min(hit["symptoms"], key=lambda name: self.weights[self.scorer.index[name]])
+            if column not in found:
+                found.append(column)
+            remainder = remainder.replace(hit["text"], " ")
+        return found, remainder
+
+    def assess_batch(self, texts: List[str]) -> List[Dict]:
+        """Triage many messages at once (offline replay); parsing is per message, scoring is one matmul"""
+        parsed, remainders = zip(*(self.parse(text) for text in texts)) if texts else ((), ())
+        vectors = np.zeros((len(texts), len(self.scorer.symptoms)), dtype=np.float32)
+        for row, columns in enumerate(parsed):
+            vectors[row, [self.scorer.index[column] for column in columns]] = 1.0
+        # Intensity words are read from the text left after removing symptom names ("mild fever" is a symptom)
+        result = self.tier_vectors(
+            vectors,
+            severe=[SEVERE_PATTERN.search(rest) is not None for rest in remainders],
+            mild=[MILD_PATTERN.search(rest) is not None for rest in remainders],
+            acute=[is_acute_emergency(text) for text in texts],
+            mentioned=["emergency" in match_keywords(text) for text in texts],
+            question=[is_general_question(text) for text in texts],
+        )
+        return [{
+            "tier": URGENCY_TIERS[result["tier"][row]],
+            "score": int(result["score"][row]),
+            "symptoms": [symptom_phrase(column) for column in columns],
+            "red_flags": [symptom_phrase(column) for column in columns if column in RED_FLAG_SYMPTOMS],
+        } for row, columns in enumerate(parsed)]
+
+    def assess(self, text: str) -> Dict:
+        """Urgency tier of one message: {"tier", "score", "symptoms", "red_flags"}"""
+        return self.assess_batch([text])[0]
+
+def is_general_question(text: str) -> bool:
+    """True when the text asks about a condition without saying anyone has it"""
+    lowered = text.lower()
+    if PERSON_PATTERN.search(lowered.replace("tell me", " ")):
+        return False
+    return QUESTION_PATTERN.search(lowered) is not None or TOPIC_PATTERN.search(lowered) is not None
+
+def is_acute_emergency(text: str) -> bool:
+    """True when the text describes an emergency happening now rather than asking about one"""
+    return ACUTE_PATTERN.search(text.lower()) is not None and not is_general_question(text)
+
+def keyword_urgency(text: str, default: str = "low") -> Dict:
+    """Assessment from the text alone, for when the severity weights could not be loaded"""
+    if is_acute_emergency(text):
+        tier = "emergency"
+    elif "emergency" in match_keywords(text):
+        tier = "high"
+    else:
+        tier = default
+    return {"tier": tier, "score": 0, "symptoms": [], "red_flags": []}
+
+def reported_urgency(assessment: Dict, text: str) -> Dict:
+    """Assessment for symptoms a user reports (analyze_symptoms): any emergency keyword floors it at emergency"""
+    if assessment["tier"] != "emergency" and "emergency" in match_keywords(text):
+        return dict(assessment, tier="emergency")
+    return assessment
+
+def load_triage(scorer: SymptomScorer = None, datasets_dir=DATASETS_DIR) -> SeverityTriage:
+    """Triage over the given symptom scorer (loaded from its cache when not passed)"""
+    return SeverityTriage.from_csv(scorer or load_symptom_scorer(datasets_dir), datasets_dir)
+
+def emergency_message(assessment: Dict) -> str:
+    """Immediate guidance returned without waiting for a model when a message is tiered emergency"""
+    message = "🚨 **EMERGENCY SITUATION DETECTED**\n\nBased on your message, you may be experiencing a medical emergency. Please call emergency services immediately or go to the nearest emergency room.\n\n"
+    if assessment.get("red_flags"):
+        message += f"**Warning signs reported:** {', '.join(assessment['red_flags'])}\n\n"
+    message += "**Emergency Numbers:**\n- Pakistan: 1122\n- Local emergency services in your area\n\n**Do not wait** - seek immediate medical attention."
+    return message
+
+# -------------------- Offline Replay --------------------
+def read_messages(path: str) -> List[str]:
+    """Messages from a text file (one per line), or only the [REQUEST] lines when it is healthcare_agent.log"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    logged = [found.group(1) for found in map(REQUEST_LOG_RE.search, lines) if found]
+    return logged if logged else lines
+
+def run_checks(triage: SeverityTriage) -> int:
+    """Number of EMERGENCY_CHECKS / QUESTION_CHECKS messages tiered the wrong way"""
+    failures = 0
+    for text, assessment in zip(EMERGENCY_CHECKS, triage.assess_batch(EMERGENCY_CHECKS)):
+        tier = reported_urgency(assessment, text)["tier"]
+        if tier != "emergency":
+            failures += 1
+            print(f"[ERROR] Reported '{text}' is {tier}, expected emergency")
+    for text, assessment in zip(QUESTION_CHECKS, triage.assess_batch(QUESTION_CHECKS)):
+        if assessment["tier"] == "emergency":
+            failures += 1
+            print(f"[ERROR] Question '{text}' is emergency")
+    if not failures:
+        print(f"[OK] {len(EMERGENCY_CHECKS)} reported emergencies and {len(QUESTION_CHECKS)} questions tiered as expected")
+    return failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay messages through the severity triage")
+    parser.add_argument("path", nargs="?", help="Text file with one message per line, or healthcare_agent.log")
+    parser.add_argument("--show", action="store_true", help="Print the tier of every message")
+    parser.add_argument("--check", action="store_true", help="Check the emergency and question regression messages")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    triage = load_triage()
+    if args.check and run_checks(triage):
+        raise SystemExit(1)
+    if args.path:
+        messages = read_messages(args.path)
+        assessments = triage.assess_batch(messages)
+        if args.show:
+            for message, assessment in zip(messages, assessments):
+                print(f"[INFO] {assessment['tier']:<9} score={assessment['score']:<3} {message}")
+        counts = Counter(assessment["tier"] for assessment in assessments)
+        print(f"[OK] Triaged {len(messages)} messages: " + ", ".join(f"{tier}={counts.get(tier, 0)}" for tier in URGENCY_TIERS))
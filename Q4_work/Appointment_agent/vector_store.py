@@ -0,0 +1,614 @@
+import argparse
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import numpy as np
+from pinecone import Pinecone
+
+# -------------------- Configuration --------------------
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE", "pinecone")  # "pinecone" or "local"
+VECTOR_STORE_BACKENDS = ("pinecone", "local")
+PINECONE_INDEX_NAME = "healthcare-embeddings"
+PINECONE_INDEX_HOST = "https://healthcare-embeddings-locsd7i.svc.aped-4627-b74a.pinecone.io"
+LOCAL_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", os.path.join("cache", "vector_store"))
+LOCAL_INDEX_MODE = os.getenv("LOCAL_VECTOR_INDEX", "exact")  # "exact" brute force or "ivf" approximate
+LOCAL_INDEX_MODES = ("exact", "ivf")
+IVF_NLISTS = int(os.getenv("IVF_NLISTS", "0"))  # 0 = about 2 * sqrt(vector count)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))  # lists scanned per query: higher = better recall, slower
+NAMESPACE_QUERY_WORKERS = int(os.getenv("NAMESPACE_QUERY_WORKERS", "32"))  # concurrent per-namespace queries (I/O bound)
+LOCAL_QUANTIZATION = os.getenv("LOCAL_VECTOR_QUANTIZATION", "none")  # "none" or "int8" scan codes
+LOCAL_QUANTIZATIONS = ("none", "int8")
+INT8_RESCORE_FACTOR = int(os.getenv("INT8_RESCORE_FACTOR", "4"))  # candidates re-scored in float per result
+INT8_SCAN_BLOCK = 4096  # codes widened to float32 this many rows at a time
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_PER_LIST = 64  # k-means training sample size per list
+
+# -------------------- Interface --------------------
+class VectorStore:
+    """What the RAG tools and the ingestion pipeline need from a vector index.
+
+    Queries return {"matches": [{"id", "score", "metadata"}, ...]} like a Pinecone response,
+    so call sites work unchanged with either backend.
+    """
+
+    def query(self, vector, top_k=3, include_metadata=True, filter=None, namespace=None):
+        raise NotImplementedError
+
+    def upsert(self, vectors, namespace=None):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace=None):
+        raise NotImplementedError
+
+    def save(self):
+        """Persist pending writes (remote backends write through)"""
+
+    def dimension(self):
+        """Dimension of the stored vectors, or None when the store is empty or cannot tell"""
+        return None
+
+# -------------------- Pinecone Backend --------------------
+class PineconeVectorStore(VectorStore):
+    """Remote Pinecone index"""
+
+    def __init__(self, index_name=PINECONE_INDEX_NAME, host=PINECONE_INDEX_HOST, index=None):
+        if index is None:
+            pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+            index = pc.Index(index_name, host=host) if host else pc.Index(index_name)
+        self.index = index
+
+    def query(self, vector, top_k=3, include_metadata=True, filter=None, namespace=None):
+        kwargs = {"filter": filter} if filter else {}
+        if namespace:
+            kwargs["namespace"] = namespace
+        return self.index.query(vector=list(vector), top_k=top_k, include_metadata=include_metadata, **kwargs)
+
+    def upsert(self, vectors, namespace=None):
+        return self.index.upsert(vectors=vectors, **({"namespace": namespace} if namespace else {}))
+
+    def delete(self, ids, namespace=None):
+        return self.index.delete(ids=ids, **({"namespace": namespace} if namespace else {}))
+
+    def dimension(self):
+        return self.index.describe_index_stats().dimension
+
+# -------------------- Local Backend --------------------
+def _condition_mask(column, condition):
+    """Rows of a metadata column matching a Pinecone-style condition ($eq, $ne, $in, $nin)"""
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    mask = np.ones(len(column), dtype=bool)
+    for op, value in condition.items():
+        if op == "$eq":
+            mask &= column == value
+        elif op == "$ne":
+            mask &= column != value
+        elif op in ("$in", "$nin"):
+            hits = np.fromiter((item in value for item in column), dtype=bool, count=len(column))
+            mask &= hits if op == "$in" else ~hits
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return mask
+
+# -------------------- IVF-Flat ANN Index --------------------
+def _assign(vectors, centroids, block=65536):
+    """Nearest centroid (by cosine) for every vector, in blocks to bound memory"""
+    return np.concatenate([np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+                           for start in range(0, len(vectors), block)]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+class IVFFlatIndex:
+    """Inverted-file index over unit vectors: spherical k-means lists, exact scoring inside probed lists.
+
+    A query scores the n_lists centroids, then only the vectors in the nprobe best lists, so
+    cost falls from N to about N * nprobe / n_lists dot products. nprobe trades recall for latency.
+    """
+
+    def __init__(self, centroids, order, offsets):
+        self.centroids = centroids  # (n_lists, dim) unit vectors
+        self.order = order  # vector slots grouped by list
+        self.offsets = offsets  # list i holds order[offsets[i]:offsets[i + 1]]
+
+    @property
+    def vector_count(self):
+        return len(self.order)
+
+    @classmethod
+    def build(cls, vectors, n_lists=0, iterations=IVF_TRAIN_ITERATIONS, seed=0):
+        """Train centroids on a sample of the vectors, then file every vector under its nearest list"""
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_lists = max(1, min(n_lists or int(2 * np.sqrt(len(vectors))), len(vectors)))
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), IVF_TRAIN_PER_LIST * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = _assign(sample, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[np.argsort(assignment, kind="stable")], starts[~empty])
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]  # reseed empty lists
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1)).astype(np.int64)
+        return cls(centroids.astype(np.float32), order, offsets)
+
+    def candidates(self, query, nprobe=IVF_NPROBE):
+        """Vector slots in the nprobe lists whose centroids score highest against the query"""
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in probed])
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["centroids"], saved["order"], saved["offsets"])
+
+# -------------------- Int8 Quantization --------------------
+class Int8Codes:
+    """Unit vectors stored as int8 codes with one float32 scale per vector (~1/4 of float32).
+
+    vector ~= codes * scale, so a query scores codes @ query * scale. Codes are widened to
+    float32 in blocks, so the scan never holds a full float copy of the matrix.
+    """
+
+    def __init__(self, codes, scales):
+        self.codes = codes  # (n, dim) int8
+        self.scales = scales  # (n,) float32
+
+    @property
+    def vector_count(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    @classmethod
+    def build(cls, vectors, block=65536):
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), block):
+            chunk = np.asarray(vectors[start:start + block], dtype=np.float32)
+            peak = np.maximum(np.abs(chunk).max(axis=1), 1e-12)
+            scales[start:start + block] = peak / 127
+            codes[start:start + block] = np.rint(chunk / (peak[:, None] / 127)).astype(np.int8)
+        return cls(codes, scales)
+
+    def scores(self, query, slots=None):
+        """Approximate cosine of every vector (or of the given slots) against a unit query"""
+        if slots is not None:
+            return (self.codes[slots].astype(np.float32) @ query) * self.scales[slots]
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), INT8_SCAN_BLOCK):
+            out[start:start + INT8_SCAN_BLOCK] = self.codes[start:start + INT8_SCAN_BLOCK].astype(np.float32) @ query
+        return out * self.scales
+
+    def save(self, path):
+        np.savez(path, codes=self.codes, scales=self.scales)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["codes"], saved["scales"])
+
+class LocalVectorStore(VectorStore):
+    """In-process cosine search: NumPy brute force over a memory-mapped float32 matrix.
+
+    Rows are unit-normalized on write and identical vectors are stored once, with a row ->
+    vector map (fanout ingestion gives most rows a shared vector), so a query is one
+    matrix-vector product over the unique vectors, a gather and a partial sort. Files live
+    in LOCAL_STORE_DIR (vectors.f32 plus a pickle of ids, metadata and the row map); a loaded
+    store maps the matrix read-only and copies it into memory only on the first write.
+
+    With index_mode="ivf" an IVFFlatIndex (ivf.npz) is built on save and probes only nprobe
+    lists per query; until the next save, writes fall back to exact search.
+
+    With quantization="int8" candidates are scored on Int8Codes (int8.npz) and only the best
+    top_k * INT8_RESCORE_FACTOR are re-scored against the float32 rows, which stay memory-mapped
+    on disk; the full float matrix is never scanned, so it does not need to stay resident.
+    """
+
+    def __init__(self, directory=LOCAL_STORE_DIR, index_mode=LOCAL_INDEX_MODE, nprobe=IVF_NPROBE, n_lists=IVF_NLISTS,
+                 quantization=LOCAL_QUANTIZATION):
+        if index_mode not in LOCAL_INDEX_MODES:
+            raise ValueError(f"Unknown local index mode: {index_mode} (expected one of {LOCAL_INDEX_MODES})")
+        if quantization not in LOCAL_QUANTIZATIONS:
+            raise ValueError(f"Unknown local quantization: {quantization} (expected one of {LOCAL_QUANTIZATIONS})")
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "metadata.pkl")
+        self.ivf_path = os.path.join(directory, "ivf.npz")
+        self.int8_path = os.path.join(directory, "int8.npz")
+        self.index_mode = index_mode
+        self.quantization = quantization
+        self.nprobe = nprobe
+        self.n_lists = n_lists
+        self.mutex = threading.RLock()  # ingestion upserts from several worker threads
+        self.load()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def dimension(self):
+        return self.vectors.shape[1] if self.ids else None
+
+    def load(self):
+        self.vectors = np.zeros((0, 0), dtype=np.float32)  # unique unit vectors
+        self.row_vector = np.zeros(0, dtype=np.int32)  # row -> index into vectors
+        self.ids, self.metadata, self.namespaces = [], [], []
+        self.slot_of = None  # vector bytes -> index into vectors, built on the first write
+        self.pending = []  # vectors appended since the matrix was last consolidated
+        self.columns = {}  # metadata field -> object array (and leaf filter masks), built on first filtered query
+        self.dirty = False
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "rb") as f:
+                saved = pickle.load(f)
+            self.ids, self.metadata, self.namespaces = saved["ids"], saved["metadata"], saved["namespaces"]
+            self.row_vector = saved["row_vector"]
+            if len(saved["row_vector"]):
+                self.vectors = np.memmap(self.matrix_path, dtype=np.float32, mode="r",
+                                         shape=(saved["vector_count"], saved["dim"]))
+        self.rows = {(ns, vector_id): row for row, (ns, vector_id) in enumerate(zip(self.namespaces, self.ids))}
+
+        self.ann = None
+        if self.index_mode == "ivf" and len(self.vectors):
+            if os.path.exists(self.ivf_path):
+                self.ann = IVFFlatIndex.load(self.ivf_path)
+            if self.ann is None or self.ann.vector_count != len(self.vectors):
+                self.build_ann()
+
+        self.quantized = None
+        if self.quantization == "int8" and len(self.vectors):
+            if os.path.exists(self.int8_path):
+                self.quantized = Int8Codes.load(self.int8_path)
+            if self.quantized is None or self.quantized.vector_count != len(self.vectors):
+                self.build_quantized()
+
+    def build_quantized(self):
+        """(Re)build the int8 codes for the stored vectors and save them next to them"""
+        with self.mutex:
+            self._consolidate()
+            self.quantized = Int8Codes.build(self.vectors)
+            os.makedirs(self.directory, exist_ok=True)
+            self.quantized.save(self.int8_path + ".tmp.npz")
+            os.replace(self.int8_path + ".tmp.npz", self.int8_path)
+            print(f"[OK] Built int8 codes: {self.quantized.nbytes / 2**20:.1f} MB "
+                  f"(float32 {self.vectors.nbytes / 2**20:.1f} MB)")
+
+    def build_ann(self):
+        """(Re)build the IVF index over the stored vectors and save it next to them"""
+        with self.mutex:
+            self._consolidate()
+            self.ann = IVFFlatIndex.build(self.vectors, self.n_lists)
+            os.makedirs(self.directory, exist_ok=True)
+            self.ann.save(self.ivf_path + ".tmp.npz")
+            os.replace(self.ivf_path + ".tmp.npz", self.ivf_path)
+            print(f"[OK] Built IVF index: {len(self.ann.offsets) - 1} lists over {self.ann.vector_count} vectors")
+
+    def save(self):
+        """Write matrix and metadata atomically; a no-op when nothing changed"""
+        with self.mutex:
+            if not self.dirty:
+                return
+            self._consolidate()
+            # Drop vectors no row points at any more (left behind by deletes and overwrites)
+            used, row_vector = np.unique(self.row_vector, return_inverse=True)
+            vectors = self.vectors[used] if len(used) else self.vectors[:0]
+
+            os.makedirs(self.directory, exist_ok=True)
+            np.ascontiguousarray(vectors, dtype=np.float32).tofile(self.matrix_path + ".tmp")
+            with open(self.meta_path + ".tmp", "wb") as f:
+                pickle.dump({"ids": self.ids, "metadata": self.metadata, "namespaces": self.namespaces,
+                             "row_vector": row_vector.astype(np.int32), "vector_count": len(vectors),
+                             "dim": vectors.shape[1]}, f)
+            os.replace(self.matrix_path + ".tmp", self.matrix_path)
+            os.replace(self.meta_path + ".tmp", self.meta_path)
+            for derived in (self.ivf_path, self.int8_path):
+                if os.path.exists(derived):
+                    os.remove(derived)  # stale: load() rebuilds it in ivf / int8 mode
+            self.load()
+
+    def _consolidate(self):
+        """Fold pending vectors into the matrix (one copy per batch of writes, not per upsert)"""
+        if self.pending:
+            self.vectors = np.vstack([self.vectors] + self.pending)
+            self.pending = []
+
+    def _slot(self, values):
+        """Index of an identical stored vector, appending a new one when there is none"""
+        if self.slot_of is None:
+            self.slot_of = {row.tobytes(): slot for slot, row in enumerate(self.vectors)}
+        key = values.tobytes()
+        slot = self.slot_of.get(key)
+        if slot is None:
+            slot = len(self.slot_of)
+            self.slot_of[key] = slot
+            self.pending.append(values[None, :])
+        return slot
+
+    def upsert(self, vectors, namespace=None):
+        if not vectors:
+            return {"upserted_count": 0}
+        namespace = namespace or None  # "" is Pinecone's default namespace
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1, norms)
+
+        with self.mutex:
+            if not self.ids and not self.pending:
+                self.vectors = np.zeros((0, values.shape[1]), dtype=np.float32)
+            elif values.shape[1] != self.vectors.shape[1]:
+                raise ValueError(f"Expected {self.vectors.shape[1]}-dimensional vectors, got {values.shape[1]}")
+            self.columns = {}
+            self.dirty = True
+            self.ann = None
+            self.quantized = None
+
+            slots = [self._slot(row_values) for row_values in values]
+            appended = []
+            for vector, slot in zip(vectors, slots):
+                key = (namespace, vector["id"])
+                row = self.rows.get(key)
+                if row is None:
+                    self.rows[key] = len(self.ids)
+                    self.ids.append(vector["id"])
+                    self.namespaces.append(namespace)
+                    self.metadata.append(vector.get("metadata", {}))
+                    appended.append(slot)
+                else:
+                    self.row_vector[row] = slot
+                    self.metadata[row] = vector.get("metadata", {})
+            if appended:
+                self.row_vector = np.concatenate([self.row_vector, np.asarray(appended, dtype=np.int32)])
+            return {"upserted_count": len(vectors)}
+
+    def delete(self, ids, namespace=None):
+        namespace = namespace or None
+        with self.mutex:
+            doomed = {self.rows[(namespace, i)] for i in ids if (namespace, i) in self.rows}
+            if not doomed:
+                return {}
+            keep = np.array([row not in doomed for row in range(len(self.ids))], dtype=bool)
+            self.row_vector = self.row_vector[keep]
+            self.ids = [v for v, k in zip(self.ids, keep) if k]
+            self.metadata = [m for m, k in zip(self.metadata, keep) if k]
+            self.namespaces = [n for n, k in zip(self.namespaces, keep) if k]
+            self.rows = {(ns, vector_id): row for row, (ns, vector_id) in enumerate(zip(self.namespaces, self.ids))}
+            self.columns = {}
+            self.dirty = True
+            self.ann = None
+            self.quantized = None
+            return {}
+
+    def _column(self, field):
+        if field not in self.columns:
+            column = np.empty(len(self.ids), dtype=object)
+            column[:] = self.namespaces if field == "__namespace__" else [meta.get(field) for meta in self.metadata]
+            self.columns[field] = column
+        return self.columns[field]
+
+    def filter_mask(self, filter: Dict):
+        """Boolean row mask for a Pinecone-style metadata filter, including $and / $or"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, condition in filter.items():
+            if field == "$and":
+                for sub in condition:
+                    mask &= self.filter_mask(sub)
+            elif field == "$or":
+                mask &= np.logical_or.reduce([self.filter_mask(sub) for sub in condition])
+            else:
+                key = (field, repr(condition))  # leaf masks are memoized until the next write
+                if key not in self.columns:
+                    self.columns[key] = _condition_mask(self._column(field), condition)
+                mask &= self.columns[key]
+        return mask
+
+    def namespace_mask(self, namespace):
+        """Boolean row mask for one namespace or a list of them, memoized like the leaf filter masks"""
+        names = frozenset(namespace) if isinstance(namespace, (list, tuple, set, frozenset)) else frozenset([namespace])
+        key = ("__namespace__", names)
+        if key not in self.columns:
+            self.columns[key] = _condition_mask(self._column("__namespace__"), {"$in": names})
+            self.columns[("__rows__", names)] = np.flatnonzero(self.columns[key])
+        return self.columns[key]
+
+    def namespace_rows(self, namespace):
+        """Row positions of a namespace set, so an unfiltered scoped query does no per-row work"""
+        names = frozenset(namespace) if isinstance(namespace, (list, tuple, set, frozenset)) else frozenset([namespace])
+        if ("__rows__", names) not in self.columns:
+            self.namespace_mask(namespace)
+        return self.columns[("__rows__", names)]
+
+    def query(self, vector, top_k=3, include_metadata=True, filter=None, namespace=None, exact=False,
+              rescore_factor=None):
+        """Top-k rows by cosine; approximate when an IVF index is loaded, unless exact=True.
+
+        namespace may be one name or a list of names; None searches every namespace.
+        rescore_factor overrides INT8_RESCORE_FACTOR for this query.
+        """
+        with self.mutex:
+            self._consolidate()
+            if not self.ids:
+                return {"matches": []}
+            query = np.asarray(vector, dtype=np.float32)
+            if query.shape[0] != self.vectors.shape[1]:
+                raise ValueError(f"Expected a {self.vectors.shape[1]}-dimensional query, got {query.shape[0]}")
+            norm = np.linalg.norm(query)
+            query = query / norm if norm else query
+            quantized = self.quantized if not exact else None
+            if self.ann is not None and not exact:
+                # Vectors outside the probed lists keep -inf and never reach the results
+                slots = self.ann.candidates(query, self.nprobe)
+                vector_scores = np.full(len(self.vectors), -np.inf, dtype=np.float32)
+                vector_scores[slots] = quantized.scores(query, slots) if quantized else self.vectors[slots] @ query
+            else:
+                vector_scores = quantized.scores(query) if quantized else self.vectors @ query
+
+            rows = None
+            if filter or namespace is not None:
+                if filter:
+                    mask = self.filter_mask(filter)
+                    if namespace is not None:
+                        mask = mask & self.namespace_mask(namespace)
+                    rows = np.flatnonzero(mask)
+                else:
+                    rows = self.namespace_rows(namespace)
+                scores = vector_scores[self.row_vector[rows]]
+            else:
+                scores = vector_scores[self.row_vector]
+
+            k = min(top_k * (rescore_factor or INT8_RESCORE_FACTOR) if quantized else top_k, len(scores))
+            if k == 0:
+                return {"matches": []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            if quantized:
+                # Re-score the int8 shortlist with the float32 rows, then keep the true top_k
+                top = top[np.isfinite(scores[top])]
+                scores[top] = self.vectors[self.row_vector[top if rows is None else rows[top]]] @ query
+                top = top[np.argpartition(-scores[top], min(top_k, len(top)) - 1)[:top_k]] if len(top) else top
+            top = top[np.argsort(-scores[top])]
+
+            matches = []
+            for position in top[np.isfinite(scores[top])]:
+                row = position if rows is None else rows[position]
+                match = {"id": self.ids[row], "score": float(scores[position]), "namespace": self.namespaces[row]}
+                if include_metadata:
+                    match["metadata"] = self.metadata[row]
+                matches.append(match)
+            return {"matches": matches}
+
+# -------------------- Namespace Fan-out --------------------
+namespace_query_pool = ThreadPoolExecutor(max_workers=NAMESPACE_QUERY_WORKERS, thread_name_prefix="namespace-query")
+
+def merge_matches(responses, top_k: int) -> List[Dict]:
+    """Merge (namespace, response) pairs into one best-first match list tagged with namespaces"""
+    matches = []
+    for namespace, response in responses:
+        for match in response.get("matches", []):
+            matches.append({"id": match["id"], "score": match.get("score", 0),
+                            "metadata": match.get("metadata") or {}, "namespace": namespace})
+    return sorted(matches, key=lambda match: match["score"], reverse=True)[:top_k]
+
+def query_namespaces(store: VectorStore, vector, namespaces: List[str], top_k: int = 3, **kwargs) -> Dict:
+    """Query only the given namespaces, concurrently, and merge their top matches.
+
+    The local store answers a namespace list in one pass; remote namespaces are queried in
+    parallel on a shared thread pool.
+    """
+    if isinstance(store, LocalVectorStore):
+        return store.query(vector, top_k=top_k, namespace=list(namespaces), **kwargs)
+
+    futures = [(namespace, namespace_query_pool.submit(store.query, vector, top_k=top_k, namespace=namespace, **kwargs))
+               for namespace in namespaces]
+    return {"matches": merge_matches([(namespace, future.result()) for namespace, future in futures], top_k)}
+
+# -------------------- Factory --------------------
+def get_vector_store(backend: str = VECTOR_STORE_BACKEND, **kwargs) -> VectorStore:
+    """Vector store selected by config (VECTOR_STORE env var)"""
+    if backend == "pinecone":
+        return PineconeVectorStore(**kwargs)
+    if backend == "local":
+        return LocalVectorStore(**kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend} (expected one of {VECTOR_STORE_BACKENDS})")
+
+# -------------------- Recall Benchmark --------------------
+RECALL_SCORE_TOLERANCE = 1e-5
+
+def exact_top_scores(store: LocalVectorStore, queries, k: int) -> List[List[float]]:
+    """Scores of the exact top-k of every query"""
+    return [[m["score"] for m in store.query(query, top_k=k, include_metadata=False, exact=True)["matches"]]
+            for query in queries]
+
+def recall_hits(matches: List[Dict], expected_scores: List[float]) -> int:
+    """Returned matches that belong in the exact top-k. Fanout rows share one vector, so ties are
+    broken by id arbitrarily; a match counts when it scores at least the exact k-th score."""
+    if not expected_scores:
+        return 0
+    floor = min(expected_scores) - RECALL_SCORE_TOLERANCE
+    return sum(1 for match in matches if match["score"] >= floor)
+
+def compare_recall(store: LocalVectorStore, queries, k=5, nprobes=(1, 2, 4, 8, 16, 32)) -> List[Dict]:
+    """recall@k and mean latency of IVF search at each nprobe, measured against exact search"""
+    if store.ann is None:
+        store.build_ann()
+    started = time.perf_counter()
+    exact_scores = exact_top_scores(store, queries, k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"[INFO] exact: recall@{k} 1.000, {exact_ms:.3f} ms/query")
+
+    results, saved_nprobe = [], store.nprobe
+    try:
+        for nprobe in nprobes:
+            store.nprobe = nprobe
+            hits, started = 0, time.perf_counter()
+            for query, expected in zip(queries, exact_scores):
+                hits += recall_hits(store.query(query, top_k=k, include_metadata=False)["matches"], expected)
+            ms = (time.perf_counter() - started) * 1000 / len(queries)
+            recall = hits / max(1, sum(len(expected) for expected in exact_scores))
+            results.append({"nprobe": nprobe, "recall": recall, "ms_per_query": ms, "exact_ms_per_query": exact_ms})
+            print(f"[INFO] ivf nprobe={nprobe}: recall@{k} {recall:.3f}, {ms:.3f} ms/query")
+    finally:
+        store.nprobe = saved_nprobe
+    return results
+
+def compare_quantization(directory, queries, k=5, rescore_factors=(1, 2, 4, 8)) -> List[Dict]:
+    """Memory saved and recall@k retained by int8 scanning, measured against exact float32 search"""
+    exact_store = LocalVectorStore(directory, index_mode="exact", quantization="none")
+    int8_store = LocalVectorStore(directory, index_mode="exact", quantization="int8")
+    float_bytes, int8_bytes = exact_store.vectors.nbytes, int8_store.quantized.nbytes
+
+    started = time.perf_counter()
+    exact_scores = exact_top_scores(exact_store, queries, k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"[INFO] float32: {float_bytes / 2**20:.1f} MB scanned, recall@{k} 1.000, {exact_ms:.3f} ms/query")
+
+    results = []
+    for factor in rescore_factors:
+        hits, started = 0, time.perf_counter()
+        for query, expected in zip(queries, exact_scores):
+            matches = int8_store.query(query, top_k=k, include_metadata=False, rescore_factor=factor)["matches"]
+            hits += recall_hits(matches, expected)
+        ms = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = hits / max(1, sum(len(expected) for expected in exact_scores))
+        results.append({"rescore_factor": factor, "recall": recall, "ms_per_query": ms, "exact_ms_per_query": exact_ms,
+                        "int8_bytes": int8_bytes, "float_bytes": float_bytes})
+        print(f"[INFO] int8 rescore x{factor}: {int8_bytes / 2**20:.1f} MB scanned "
+              f"({1 - int8_bytes / float_bytes:.0%} saved), recall@{k} {recall:.3f}, {ms:.3f} ms/query")
+    return results
+
+def sample_queries(store: LocalVectorStore, count=200, noise=0.05, seed=0):
+    """Offline stand-in queries: stored vectors with Gaussian noise (no embedding API needed)"""
+    rng = np.random.default_rng(seed)
+    picks = np.asarray(store.vectors[rng.choice(len(store.vectors), min(count, len(store.vectors)), replace=False)])
+    return picks + rng.normal(0, noise, picks.shape).astype(np.float32)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the local IVF index or int8 codes and compare recall with exact search")
+    parser.add_argument("--compare", choices=("ivf", "int8"), default="ivf")
+    parser.add_argument("--directory", default=LOCAL_STORE_DIR)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlists", type=int, default=IVF_NLISTS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    local_store = LocalVectorStore(args.directory, index_mode="exact", quantization="none")
+    if not len(local_store):
+        print(f"[ERROR] No local vector store in {args.directory}; run embedding.py --backend local first")
+    elif args.compare == "int8":
+        compare_quantization(args.directory, sample_queries(local_store, args.queries), k=args.k)
+    else:
+        ivf_store = LocalVectorStore(args.directory, index_mode="ivf", n_lists=args.nlists, quantization="none")
+        compare_recall(ivf_store, sample_queries(ivf_store, args.queries), k=args.k)